@@ -0,0 +1,144 @@
+"""Payload cost and fidelity of every controller backend.
+
+Builds humidifiers for each registered backend against the in-process
+stand-ins of harness.py, with mqtt.publish answered by a local broker
+stand-in. Reports how long transcoding the code set took for the first
+entity and for the following ones, the cost of a send, the cost a send
+would have if it transcoded its payload, and checks that every payload
+received decodes back to the pulse train of its command. Requires Home
+Assistant to be installed. Run from the repository root:
+
+    python benchmarks/backends.py [--entities 20] [--sends 2000]
+"""
+import argparse
+import asyncio
+from base64 import b64decode
+import time
+import timeit
+
+from harness import StubHass, async_code_set, entity_config, BenchHumidifier
+
+from custom_components.irhumidifier import transcoder
+from custom_components.irhumidifier.controller import (
+    BROADLINK_CONTROLLER,
+    CONTROLLERS,
+    ESPHOME_CONTROLLER,
+    MQTT_CONTROLLER,
+    RAW_CONTROLLER,
+)
+
+# Largest difference allowed between a decoded pulse and the original, in
+# microseconds: a Broadlink tick is about 30 us, a Pronto period 26 us.
+TOLERANCE = 35
+
+
+def target(backend, index):
+    if backend == MQTT_CONTROLLER:
+        return f"ir/blaster_{index}/pronto"
+    if backend == ESPHOME_CONTROLLER:
+        return f"blaster_{index}_transmit_raw"
+    if backend == RAW_CONTROLLER:
+        return f"ir_blaster.transmit_{index}"
+    return f"remote.blaster_{index}"
+
+
+def received(hass, backend):
+    """Return the payloads received by the stand-ins, as pulse trains."""
+    if backend == BROADLINK_CONTROLLER:
+        return [
+            transcoder.broadlink2pulses(b64decode(payload.removeprefix("b64:")))
+            for *_, payloads in hass.remote.calls
+            for payload in payloads
+        ]
+    if backend == MQTT_CONTROLLER:
+        return [
+            transcoder.pronto2lirc(bytes.fromhex(payload.replace(" ", "")))
+            for _, payload in hass.services.broker.messages
+        ]
+    return [[abs(pulse) for pulse in payload] for payload in hass.calls]
+
+
+def matches(pulses, expected) -> bool:
+    return len(pulses) == len(expected) and all(
+        abs(a - b) <= TOLERANCE for a, b in zip(pulses, expected)
+    )
+
+
+async def run_backend(backend, args):
+    hass = StubHass()
+    hass.calls = []
+
+    async def record(call):
+        hass.calls.append(call.data.get("command") or call.data.get("timings"))
+
+    for index in range(args.blasters):
+        if backend == ESPHOME_CONTROLLER:
+            hass.services.async_register("esphome", target(backend, index), record)
+        elif backend == RAW_CONTROLLER:
+            hass.services.async_register(*target(backend, index).split(".", 1), record)
+
+    code_set = await async_code_set(hass)
+    timings = []
+    entities = []
+    for index in range(args.entities):
+        config = entity_config(
+            index,
+            controller=backend,
+            controller_data=target(backend, index % args.blasters),
+            merge_commands=False,
+        )
+        started = time.perf_counter()
+        entity = BenchHumidifier(hass, config, code_set, None)
+        timings.append(time.perf_counter() - started)
+        entities.append(entity)
+
+    controller = entities[0]._controller
+    commands = list(controller._table)
+    for command in commands:
+        await controller.send(command)
+    expected = [
+        transcoder.broadlink2pulses(controller._table.packet(command))
+        for command in commands
+    ]
+    verified = sum(
+        matches(pulses, want)
+        for pulses, want in zip(received(hass, backend), expected)
+    )
+
+    started = time.perf_counter()
+    for number in range(args.sends):
+        await controller.send(commands[number % len(commands)], 0)
+    send = (time.perf_counter() - started) / args.sends
+
+    packets = [controller._table.packet(command) for command in commands]
+    transcode = timeit.timeit(
+        lambda: [controller.serialize(packet) for packet in packets], number=100
+    ) / (100 * len(packets))
+
+    print(
+        f"{backend:10s} {controller.native_format:14s} "
+        f"{timings[0] * 1000:8.2f} ms {sum(timings[1:]) / max(1, len(timings) - 1) * 1000:8.3f} ms "
+        f"{send * 1e6:8.1f} us {transcode * 1e6:10.1f} us "
+        f"{verified:4d}/{len(commands)}"
+    )
+
+
+async def run(args):
+    print(
+        f"{'backend':10s} {'format':14s} {'1st entity':>11s} {'next':>11s} "
+        f"{'send':>11s} {'transcode':>13s} verified"
+    )
+    for backend in CONTROLLERS:
+        await run_backend(backend, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=20)
+    parser.add_argument("--blasters", type=int, default=4)
+    parser.add_argument("--sends", type=int, default=2000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
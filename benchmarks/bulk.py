@@ -0,0 +1,89 @@
+"""A morning routine run entity by entity and through the bulk service.
+
+Brings humidifiers spread over a few blasters from off to a mode and a
+humidity, first by calling the entity services of one humidifier after
+the other as a script would, then with one set_states call. Runs offline
+against the in-process stand-ins of harness.py. Requires Home Assistant
+to be installed. Run from the repository root:
+
+    python benchmarks/bulk.py [--entities 40] [--blasters 12] [--latency 0.05]
+"""
+import argparse
+import asyncio
+from dataclasses import replace
+import logging
+import time
+
+from harness import FakeRemote, StubHass, async_entities, percentile
+
+from custom_components.irhumidifier.bulk import async_apply_states, get_entities
+
+
+def reset(entities):
+    for entity in entities:
+        entity._apply_device_state(replace(entity._model.default_state, power=False))
+
+
+async def sequential(entities, args):
+    for entity in entities:
+        await entity.async_turn_on()
+        await entity.async_set_mode("auto")
+        await entity.async_set_humidity(args.humidity)
+
+
+async def bulk(entities, args):
+    return await async_apply_states(
+        entities[0].hass,
+        [
+            {
+                "entity_id": [entity.entity_id for entity in entities],
+                "state": "on",
+                "mode": "auto",
+                "humidity": args.humidity,
+            }
+        ],
+    )
+
+
+async def run(args):
+    hass = StubHass(FakeRemote(args.latency, args.jitter))
+    entities = await async_entities(hass, args.entities, args.blasters)
+    for entity in entities:
+        get_entities(hass)[entity.entity_id] = entity
+
+    reset(entities)
+    started = time.monotonic()
+    await sequential(entities, args)
+    routine = time.monotonic() - started
+    reached = sum(entity.target_humidity == args.humidity for entity in entities)
+    print(f"entity by entity {routine:8.2f} s  {reached}/{len(entities)} reached")
+
+    reset(entities)
+    started = time.monotonic()
+    report = await bulk(entities, args)
+    elapsed = time.monotonic() - started
+    reached = sum(entity.target_humidity == args.humidity for entity in entities)
+    completed = sorted(result["completed"] for result in report["entities"].values())
+    print(
+        f"set_states       {elapsed:8.2f} s  {reached}/{len(entities)} reached, "
+        f"{report['succeeded']} succeeded"
+    )
+    print(
+        f"  completed p50 {percentile(completed, 0.5):6.2f} s  "
+        f"p90 {percentile(completed, 0.9):6.2f} s  max {percentile(completed, 1.0):6.2f} s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=40)
+    parser.add_argument("--blasters", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--humidity", type=int, default=55)
+    logging.basicConfig(level=logging.CRITICAL)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compare loading a code set from its Json file and from the code pack.
+
+Requires Home Assistant to be installed. Run from the repository root:
+
+    python benchmarks/codepack.py
+"""
+import json
+import os
+import tempfile
+import timeit
+
+from harness import ROOT
+
+from custom_components.irhumidifier.codepack import CodePack, compile_pack
+from custom_components.irhumidifier.controller import BroadlinkController
+from custom_components.irhumidifier.registry import CodeSet
+
+DEVICE_CODE = 100
+NUMBER = 2000
+
+
+def compile_table(code_set):
+    controller = BroadlinkController.__new__(BroadlinkController)
+    controller._encoding = code_set.data["commandsEncoding"]
+    return {name: controller.encode(code) for name, code in code_set.commands.items()}
+
+
+def from_json(path):
+    with open(path) as j:
+        code_set = CodeSet(DEVICE_CODE, json.load(j), 0)
+    return compile_table(code_set)
+
+
+def from_pack(pack):
+    code_set = CodeSet(DEVICE_CODE, pack.device_data(DEVICE_CODE), pack.mtime)
+    return compile_table(code_set)
+
+
+def main():
+    codes_dir = os.path.join(ROOT, "codes")
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "codes.pack")
+        compile_pack(codes_dir, output)
+        pack = CodePack.open(output)
+        path = os.path.join(codes_dir, f"{DEVICE_CODE}.json")
+
+        assert {k: bytes(v) for k, v in from_pack(pack).items()} == from_json(path)
+        for label, call in (
+            ("json + base64", lambda: from_json(path)),
+            ("code pack", lambda: from_pack(pack)),
+        ):
+            seconds = timeit.timeit(call, number=NUMBER)
+            print(f"{label:14s} {seconds / NUMBER * 1e6:8.1f} us per code set")
+
+
+if __name__ == "__main__":
+    main()
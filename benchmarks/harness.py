@@ -0,0 +1,176 @@
+"""In-process stand-ins for Home Assistant and the remote service.
+
+Requires Home Assistant to be installed, but no running instance and no
+network access. Used by the benchmark scripts of this directory.
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from custom_components.irhumidifier.const import DOMAIN  # noqa: E402
+from custom_components.irhumidifier.humidifier import IRHumidifier  # noqa: E402
+from custom_components.irhumidifier.registry import (  # noqa: E402
+    DATA_REGISTRY,
+    CodeSetRegistry,
+)
+
+DEVICE_CODE = 100
+
+
+class RemoteFailure(Exception):
+    """Failure injected by the fake remote service."""
+
+
+class FakeRemote:
+    """Record remote.send_command calls, adding latency and failures.
+
+    A call takes ``latency`` seconds plus up to ``jitter`` seconds, plus
+    ``delay_secs`` between the commands of a batch like a real blaster,
+    and fails with probability ``failure_rate``.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self.calls = []
+        self.failures = 0
+        self.busy = 0.0
+
+    async def send_command(self, data):
+        started = time.monotonic()
+        commands = data["command"]
+        duration = self.latency + self._random.random() * self.jitter
+        duration += data.get("delay_secs", 0) * (len(commands) - 1)
+        if duration:
+            await asyncio.sleep(duration)
+
+        self.busy += time.monotonic() - started
+        if self._random.random() < self.failure_rate:
+            self.failures += 1
+            raise RemoteFailure(f"Injected failure on {data['entity_id']}")
+        self.calls.append((started, data["entity_id"], list(commands)))
+
+    @property
+    def commands(self) -> int:
+        """Number of payloads transmitted successfully."""
+        return sum(len(commands) for *_, commands in self.calls)
+
+
+class FakeBroker:
+    """Record mqtt.publish calls like a local broker with one subscriber."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.messages = []
+
+    async def publish(self, data):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.messages.append((data["topic"], data["payload"]))
+
+
+class StubServices:
+    """Service registry routing remote.send_command to a FakeRemote and
+    mqtt.publish to a FakeBroker."""
+
+    def __init__(self, remote: FakeRemote, broker: FakeBroker | None = None):
+        self.remote = remote
+        self.broker = broker or FakeBroker()
+        self._services = {}
+
+    async def async_call(self, domain, service, data, blocking=False, **kwargs):
+        if (domain, service) == ("remote", "send_command"):
+            await self.remote.send_command(data)
+            return
+        if (domain, service) == ("mqtt", "publish"):
+            await self.broker.publish(data)
+            return
+        handler = self._services[(domain, service)]
+        await handler(SimpleNamespace(domain=domain, service=service, data=data))
+
+    def has_service(self, domain, service):
+        return (domain, service) in self._services
+
+    def async_register(self, domain, service, handler, *args, **kwargs):
+        self._services[(domain, service)] = handler
+
+
+class StubHass:
+    """Just enough of Home Assistant to construct and drive entities."""
+
+    def __init__(
+        self, remote: FakeRemote | None = None, broker: FakeBroker | None = None
+    ):
+        self.data = {}
+        self.loop = asyncio.get_running_loop()
+        self.remote = remote or FakeRemote()
+        self.services = StubServices(self.remote, broker)
+        self.states = SimpleNamespace(get=lambda entity_id: None)
+        self.config = SimpleNamespace(path=lambda *parts: os.path.join(ROOT, *parts))
+
+    async def async_add_executor_job(self, target, *args):
+        return target(*args)
+
+    def async_create_task(self, target, *args, **kwargs):
+        return self.loop.create_task(target)
+
+
+class BenchHumidifier(IRHumidifier):
+    """Humidifier counting its state writes instead of publishing them."""
+
+    writes = 0
+
+    def async_write_ha_state(self):
+        self.writes += 1
+
+
+def entity_config(index, blasters=12, **overrides):
+    config = {
+        "unique_id": f"humidifier_{index}",
+        "name": f"Humidifier {index}",
+        "device_code": DEVICE_CODE,
+        "controller_data": f"remote.blaster_{index % blasters}",
+        "delay": 0.5,
+        "merge_commands": True,
+        "power_threshold": 2.0,
+        "diagnostic_sensor": False,
+    }
+    config.update(overrides)
+    return config
+
+
+async def async_code_set(hass: StubHass, device_code=DEVICE_CODE):
+    """Return a code set loaded from the codes directory of the repository."""
+    registry = hass.data.setdefault(DOMAIN, {}).get(DATA_REGISTRY)
+    if registry is None:
+        registry = CodeSetRegistry(hass, os.path.join(ROOT, "codes"))
+        hass.data[DOMAIN][DATA_REGISTRY] = registry
+    return await registry.async_get(device_code)
+
+
+async def async_entities(hass: StubHass, count, blasters=12, **overrides):
+    """Return entities sharing one code set, spread over the blasters."""
+    code_set = await async_code_set(hass)
+    entities = []
+    for index in range(count):
+        entity = BenchHumidifier(
+            hass, entity_config(index, blasters, **overrides), code_set
+        )
+        entity.entity_id = f"humidifier.humidifier_{index}"
+        entities.append(entity)
+    return entities
+
+
+def percentile(samples, fraction):
+    """Return a percentile of samples, which must be sorted."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
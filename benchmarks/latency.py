@@ -0,0 +1,124 @@
+"""End-to-end command latency of humidifiers driven by scripted workloads.
+
+Runs offline against the in-process stand-ins of harness.py. Requires Home
+Assistant to be installed. Run from the repository root:
+
+    python benchmarks/latency.py [--entities 48] [--blasters 4] [--latency 0.02]
+
+Workloads:
+
+    slider  a slider dragged over the humidity range of a few humidifiers
+    modes   every mode of every humidifier selected in turn
+    fleet   all humidifiers turned on and switched to auto at once
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from harness import FakeRemote, StubHass, async_entities, percentile
+
+import custom_components.irhumidifier.humidifier as humidifier_module
+
+
+async def timed(latencies, coro):
+    started = time.monotonic()
+    await coro
+    latencies.append(time.monotonic() - started)
+
+
+async def slider(entities, args):
+    latencies = []
+    for entity in entities:
+        await entity.async_turn_on()
+    await asyncio.gather(*(entity.async_set_mode("auto") for entity in entities))
+
+    calls = []
+    for entity in entities[: args.sliders]:
+        low, high = entity.min_humidity, entity.max_humidity
+        for humidity in list(range(low, high + 1, 5)) + list(range(high, low - 1, -5)):
+            calls.append(
+                asyncio.ensure_future(
+                    timed(latencies, entity.async_set_humidity(humidity))
+                )
+            )
+            await asyncio.sleep(args.slider_interval)
+    await asyncio.gather(*calls)
+    return latencies
+
+
+async def modes(entities, args):
+    latencies = []
+    for entity in entities:
+        await entity.async_turn_on()
+
+    async def cycle(entity):
+        for mode in entity.available_modes * 2:
+            await timed(latencies, entity.async_set_mode(mode))
+
+    await asyncio.gather(*(cycle(entity) for entity in entities))
+    return latencies
+
+
+async def fleet(entities, args):
+    latencies = []
+    await asyncio.gather(*(timed(latencies, e.async_turn_on()) for e in entities))
+    await asyncio.gather(
+        *(timed(latencies, e.async_set_mode("auto")) for e in entities)
+    )
+    return latencies
+
+
+WORKLOADS = {"slider": slider, "modes": modes, "fleet": fleet}
+
+
+async def run(name, args):
+    remote = FakeRemote(args.latency, args.jitter, args.failure_rate, args.seed)
+    hass = StubHass(remote)
+    entities = await async_entities(
+        hass, args.entities, args.blasters, delay=args.delay
+    )
+
+    started = time.monotonic()
+    latencies = sorted(await WORKLOADS[name](entities, args))
+    elapsed = time.monotonic() - started
+
+    print(f"{name}")
+    print(f"  operations        {len(latencies):10d}")
+    print(f"  latency p50       {percentile(latencies, 0.50) * 1000:10.1f} ms")
+    print(f"  latency p99       {percentile(latencies, 0.99) * 1000:10.1f} ms")
+    print(f"  remote calls      {len(remote.calls):10d}")
+    print(f"  commands          {remote.commands:10d}")
+    print(f"  commands/s        {remote.commands / elapsed:10.1f}")
+    print(f"  transmit time     {remote.busy:10.2f} s")
+    print(f"  wall time         {elapsed:10.2f} s")
+    print(f"  failures          {remote.failures:10d}")
+    print(f"  state writes      {sum(e.writes for e in entities):10d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("workloads", nargs="*", default=list(WORKLOADS))
+    parser.add_argument("--entities", type=int, default=48)
+    parser.add_argument("--blasters", type=int, default=4)
+    parser.add_argument("--sliders", type=int, default=4)
+    parser.add_argument("--slider-interval", type=float, default=0.05)
+    parser.add_argument("--delay", type=float, default=0.1)
+    parser.add_argument("--debounce", type=float, default=None)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Injected failures are logged by the component, keep the report readable.
+    logging.basicConfig(level=logging.CRITICAL)
+    if args.debounce is not None:
+        humidifier_module.INTENT_DEBOUNCE = args.debounce
+
+    for name in args.workloads:
+        asyncio.run(run(name, args))
+
+
+if __name__ == "__main__":
+    main()
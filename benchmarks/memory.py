@@ -0,0 +1,43 @@
+"""Measure the per-entity memory overhead of entities sharing one code set.
+
+Requires Home Assistant to be installed. Run from the repository root:
+
+    python benchmarks/memory.py [entities]
+"""
+import asyncio
+import sys
+import tracemalloc
+
+from harness import (
+    DEVICE_CODE,
+    IRHumidifier,
+    StubHass,
+    async_code_set,
+    entity_config,
+)
+
+
+async def main(count):
+    hass = StubHass()
+    code_set = await async_code_set(hass)
+
+    # Compile the shared tables before measuring.
+    IRHumidifier(hass, entity_config(-1), code_set)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    entities = [IRHumidifier(hass, entity_config(i), code_set) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    print(f"{count} entities on code set {DEVICE_CODE}")
+    print(f"  total      {total / 1024:10.1f} KiB")
+    print(f"  per entity {total / count:10.0f} B")
+
+    tables = {id(entity._controller._table) for entity in entities}
+    print(f"  command tables shared by all entities: {len(tables) == 1}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
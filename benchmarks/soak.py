@@ -0,0 +1,262 @@
+"""Soak hundreds of humidifiers against simulated IR receivers.
+
+Every payload the fake remote service receives is decoded back into
+commands with a reverse table built from the code files, and applied to
+a virtual unit listening to the humidifier that sent it. After each round
+of randomized service calls the state of every virtual unit is compared
+with the state the entity reports. Requires Home Assistant to be
+installed. Run from the repository root:
+
+    python benchmarks/soak.py [--entities 500] [--blasters 40] [--rounds 10]
+"""
+import argparse
+import asyncio
+from base64 import b64decode
+import binascii
+import contextvars
+from dataclasses import replace
+import json
+import logging
+import os
+import random
+import resource
+import time
+import tracemalloc
+
+from harness import ROOT, FakeRemote, StubHass, async_entities, percentile
+
+from custom_components.irhumidifier import transcoder
+from custom_components.irhumidifier.planner import DeviceModel
+
+# The humidifier whose service call is being carried out. Tasks inherit
+# it, so transmissions can be attributed although blasters are shared.
+SENDER = contextvars.ContextVar("sender")
+
+
+class ReverseTable:
+    """Map Broadlink payloads back to the commands of a code file."""
+
+    def __init__(self, device_data):
+        self._commands = {}
+        self._ticks = []
+        for name, code in device_data["commands"].items():
+            packet = bytes(self._packet(device_data["commandsEncoding"], code))
+            self._commands[packet] = name
+            repeat, ticks = transcoder.broadlink2ticks(packet)
+            self._ticks.append((name, repeat, ticks))
+        self._decoded = {}
+
+    @staticmethod
+    def _packet(encoding, code):
+        if encoding == "Hex":
+            return binascii.unhexlify(code)
+        if encoding == "Pronto":
+            pulses = transcoder.pronto2lirc(bytearray.fromhex(code.replace(" ", "")))
+            return transcoder.lirc2broadlink(pulses)
+        return b64decode(code)
+
+    def decode(self, payload: str) -> list:
+        """Return the commands transmitted by one payload."""
+        commands = self._decoded.get(payload)
+        if commands is None:
+            commands = self._decoded[payload] = self._decode(
+                b64decode(payload.removeprefix("b64:"))
+            )
+        return commands
+
+    def _decode(self, packet: bytes) -> list:
+        name = self._commands.get(packet)
+        if name is not None:
+            return [name]
+
+        repeat, merged = transcoder.broadlink2ticks(packet)
+        for name, own_repeat, ticks in self._ticks:
+            if ticks == merged:
+                return [name] * ((repeat + 1) // (own_repeat + 1))
+
+        copies = []
+        position = 0
+        while position < len(merged):
+            for name, own_repeat, ticks in self._ticks:
+                end = position + len(ticks)
+                if self._matches(merged[position:end], ticks):
+                    copies.append((name, own_repeat))
+                    position = end + len(ticks) % 2
+                    break
+            else:
+                raise ValueError(f"Undecodable train at tick {position}")
+
+        commands = []
+        index = 0
+        while index < len(copies):
+            name, own_repeat = copies[index]
+            commands.append(name)
+            index += own_repeat + 1
+        return commands
+
+    @staticmethod
+    def _matches(window, ticks) -> bool:
+        if len(window) != len(ticks) or window[:-1] != ticks[:-1]:
+            return False
+        # A train ending with a space may have had it stretched to a gap.
+        if len(ticks) % 2 == 0:
+            return window[-1] >= ticks[-1]
+        return window[-1] == ticks[-1]
+
+
+class ReceivingRemote(FakeRemote):
+    """Fake remote delivering the decoded commands to virtual units."""
+
+    def __init__(self, table, model, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._table = table
+        self._model = model
+        self.units = {}
+        self.unattributed = 0
+        self.received = 0
+
+    async def send_command(self, data):
+        await super().send_command(data)
+        entity = SENDER.get(None)
+        if entity is None:
+            self.unattributed += 1
+            return
+        state = self.units.get(entity)
+        if state is None:
+            state = replace(self._model.default_state, power=False)
+        for payload in data["command"]:
+            commands = self._table.decode(payload)
+            self.received += len(commands)
+            state = self._model.apply_all(state, commands)
+        self.units[entity] = state
+
+
+async def monitor_lag(lags, interval=0.05):
+    """Sample how late the event loop wakes up a sleeping task."""
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(interval)
+        lags.append(time.monotonic() - started - interval)
+
+
+async def drive(entity, rng, args):
+    """Issue a burst of random service calls to one humidifier."""
+    SENDER.set(entity.entity_id)
+    for _ in range(rng.randint(1, args.burst)):
+        action = rng.random()
+        if action < 0.15:
+            await entity.async_turn_off()
+        elif action < 0.35:
+            await entity.async_turn_on()
+        elif action < 0.55:
+            await entity.async_set_mode(rng.choice(entity._attr_available_modes))
+        elif action < 0.75:
+            await entity.async_set_humidity(rng.randrange(30, 81, 5))
+        elif action < 0.9:
+            await entity.async_set_speed(rng.randint(1, 7))
+        else:
+            await entity.async_toggle_function(
+                rng.choice(entity._supported_extra_functions)
+            )
+        await asyncio.sleep(rng.random() * args.think)
+
+
+def divergent(entities, remote, model):
+    """Return the entities whose reported state differs from their unit."""
+    off = replace(model.default_state, power=False)
+    return [
+        entity.entity_id
+        for entity in entities
+        if entity._device_state() != remote.units.get(entity.entity_id, off)
+    ]
+
+
+async def run(args):
+    with open(os.path.join(ROOT, "codes", "100.json")) as j:
+        device_data = json.load(j)
+    model = DeviceModel.from_device_data(device_data)
+    remote = ReceivingRemote(
+        ReverseTable(device_data),
+        model,
+        args.latency,
+        args.jitter,
+        args.failure_rate,
+        args.seed,
+    )
+    hass = StubHass(remote)
+
+    tracemalloc.start()
+    entities = await async_entities(
+        hass, args.entities, args.blasters, delay=args.delay
+    )
+    created, _ = tracemalloc.get_traced_memory()
+
+    rng = random.Random(args.seed)
+    lags = []
+    monitor = asyncio.ensure_future(monitor_lag(lags))
+    divergences = []
+    started = time.monotonic()
+    for number in range(args.rounds):
+        active = rng.sample(entities, max(1, int(len(entities) * args.activity)))
+        await asyncio.gather(
+            *(
+                asyncio.ensure_future(drive(entity, random.Random(rng.random()), args))
+                for entity in active
+            )
+        )
+        diverged = divergent(entities, remote, model)
+        divergences.append(len(diverged))
+        print(
+            f"round {number + 1:3d}: {len(active):4d} active, "
+            f"{len(diverged):4d} divergent"
+        )
+        if diverged and args.verbose:
+            print("  " + ", ".join(diverged[:10]))
+    elapsed = time.monotonic() - started
+    monitor.cancel()
+
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    lags.sort()
+
+    print(f"{args.entities} entities on {args.blasters} blasters")
+    print(f"  wall time          {elapsed:10.2f} s")
+    print(f"  remote calls       {len(remote.calls):10d}")
+    print(f"  payloads           {remote.commands:10d}")
+    print(f"  decoded commands   {remote.received:10d}")
+    print(f"  injected failures  {remote.failures:10d}")
+    print(f"  unattributed calls {remote.unattributed:10d}")
+    print(f"  divergent, last    {divergences[-1]:10d}")
+    print(f"  divergent, max     {max(divergences):10d}")
+    print(f"  memory, entities   {created / 1024:10.1f} KiB")
+    print(f"  memory, current    {current / 1024:10.1f} KiB")
+    print(f"  memory, peak       {peak / 1024:10.1f} KiB")
+    print(f"  max RSS            {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:10.1f} MiB")
+    print(f"  loop lag p50       {percentile(lags, 0.50) * 1000:10.2f} ms")
+    print(f"  loop lag p99       {percentile(lags, 0.99) * 1000:10.2f} ms")
+    print(f"  loop lag max       {percentile(lags, 1.0) * 1000:10.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=500)
+    parser.add_argument("--blasters", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--activity", type=float, default=0.3)
+    parser.add_argument("--burst", type=int, default=4)
+    parser.add_argument("--think", type=float, default=0.2)
+    parser.add_argument("--delay", type=float, default=0.1)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # Injected failures are logged by the component, keep the report readable.
+    logging.basicConfig(level=logging.CRITICAL)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
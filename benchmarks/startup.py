@@ -0,0 +1,106 @@
+"""Cold import and setup time of the integration.
+
+Import time is measured in fresh interpreters with ``-X importtime``. The
+Home Assistant modules any installation has loaded before setting up a
+humidifier platform are imported first, so only what the integration
+adds is counted. Setup time is measured in-process against the stand-ins
+of harness.py: loading the code set cold and creating N entities the way
+the platform setup does, concurrently. Requires Home Assistant to be
+installed. Run from the repository root:
+
+    python benchmarks/startup.py [--entities 40] [--runs 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from harness import ROOT, BenchHumidifier, StubHass, entity_config
+
+from custom_components.irhumidifier.const import DOMAIN
+from custom_components.irhumidifier.registry import DATA_REGISTRY, CodeSetRegistry
+
+# Loaded by Home Assistant before any humidifier platform is set up.
+PRELOADED = (
+    "homeassistant.core",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.entity_platform",
+    "homeassistant.helpers.restore_state",
+    "homeassistant.helpers.event",
+    "homeassistant.components.humidifier",
+)
+MODULES = (
+    "custom_components.irhumidifier",
+    "custom_components.irhumidifier.humidifier",
+)
+
+
+def import_times():
+    """Return the cumulative import time of every module the integration
+    loads on top of the preloaded ones, in microseconds."""
+    script = "; ".join(f"import {module}" for module in PRELOADED)
+    script += "; import sys; sys.stderr.write('--- integration\\n'); "
+    script += "; ".join(f"import {module}" for module in MODULES)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    _, _, report = result.stderr.partition("--- integration\n")
+    times = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative)
+    return times
+
+
+async def setup(count):
+    """Set up count entities sharing a code set, returning the wall time."""
+    hass = StubHass()
+    hass.data.setdefault(DOMAIN, {})[DATA_REGISTRY] = CodeSetRegistry(
+        hass, os.path.join(ROOT, "codes")
+    )
+    registry = hass.data[DOMAIN][DATA_REGISTRY]
+
+    async def setup_platform(index):
+        config = entity_config(index)
+        code_set = await registry.async_get(config["device_code"])
+        return BenchHumidifier(hass, config, code_set)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(setup_platform(index) for index in range(count)))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.runs)]
+    totals = [sum(times.get(module, 0) for module in MODULES) for times in runs]
+    print(f"import, median of {args.runs}  {statistics.median(totals) / 1000:8.2f} ms")
+    heaviest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)
+    for module, cumulative in heaviest[: args.top]:
+        print(f"  {cumulative / 1000:8.2f} ms  {module}")
+
+    timings = [asyncio.run(setup(args.entities)) for _ in range(args.runs)]
+    median = statistics.median(timings)
+    print(
+        f"setup of {args.entities} entities   {median * 1000:8.2f} ms, "
+        f"{median / args.entities * 1e6:.0f} us per entity"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Cold and warm code file sync against a local HTTP stand-in.
+
+Serves generated code files from a local aiohttp server with ETag
+support and latency, then measures a cold fetch of every code, a warm
+start and a refresh answered with 304. Requires Home Assistant to be
+installed. Run from the repository root:
+
+    python benchmarks/sync.py [--codes 200] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from aiohttp import ClientSession, web
+from harness import ROOT, StubHass
+
+from custom_components.irhumidifier.sync import INDEX_FILE, CodeSetSync, build_index
+
+
+def make_source(directory, count):
+    """Write count code files derived from the bundled one, plus their index."""
+    with open(os.path.join(ROOT, "codes", "100.json")) as j:
+        device_data = json.load(j)
+    for code in range(1000, 1000 + count):
+        device_data["supportedModels"] = [f"Model {code}"]
+        with open(os.path.join(directory, f"{code}.json"), "w") as f:
+            json.dump(device_data, f)
+    with open(os.path.join(directory, INDEX_FILE), "w") as f:
+        json.dump(build_index(directory), f)
+    return list(range(1000, 1000 + count))
+
+
+def make_app(directory, latency, stats):
+    async def serve(request):
+        stats["requests"] += 1
+        await asyncio.sleep(latency)
+        path = os.path.join(directory, request.match_info["name"])
+        if not os.path.exists(path):
+            raise web.HTTPNotFound()
+        with open(path, "rb") as f:
+            body = f.read()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            stats["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(
+            body=body, headers={"ETag": etag}, content_type="application/json"
+        )
+
+    app = web.Application()
+    app.router.add_get("/codes/{name}", serve)
+    return app
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as target:
+        codes = make_source(source, args.codes)
+        stats = {"requests": 0, "not_modified": 0}
+        runner = web.AppRunner(make_app(source, args.latency, stats))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/codes/"
+
+        hass = StubHass()
+        async with ClientSession() as session:
+            for label, refresh in (("cold", False), ("warm", False), ("refresh", True)):
+                sync = CodeSetSync(hass, target, url, session, args.concurrency)
+                stats.update(requests=0, not_modified=0)
+                started = time.monotonic()
+                await sync.async_ensure(codes, refresh)
+                elapsed = time.monotonic() - started
+                print(
+                    f"{label:8s} {elapsed:8.2f} s  {stats['requests']:5d} requests  "
+                    f"{sync.downloaded:5d} downloaded  {stats['not_modified']:5d} not modified"
+                )
+
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--codes", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=4)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare the legacy and the current Pronto/LIRC/Broadlink transcoders.
+
+Run from the repository root:
+
+    python benchmarks/transcoder.py
+"""
+import binascii
+import importlib.util
+import os
+import random
+import struct
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPONENT_DIR = os.path.join(ROOT, "custom_components", "irhumidifier")
+
+
+def load_module(name):
+    """Load a module of the component without importing Home Assistant."""
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(COMPONENT_DIR, name + ".py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+transcoder = load_module("transcoder")
+
+
+def legacy_pronto2lirc(pronto):
+    codes = [int(binascii.hexlify(pronto[i:i+2]), 16) for i in range(0, len(pronto), 2)]
+
+    if codes[0]:
+        raise ValueError("Pronto code should start with 0000")
+    if len(codes) != 4 + 2 * (codes[2] + codes[3]):
+        raise ValueError("Number of pulse widths does not match the preamble")
+
+    frequency = 1 / (codes[1] * 0.241246)
+    return [int(round(code / frequency)) for code in codes[4:]]
+
+
+def legacy_lirc2broadlink(pulses):
+    array = bytearray()
+
+    for pulse in pulses:
+        pulse = int(pulse * 269 / 8192)
+
+        if pulse < 256:
+            array += bytearray(struct.pack('>B', pulse))
+        else:
+            array += bytearray([0x00])
+            array += bytearray(struct.pack('>H', pulse))
+
+    packet = bytearray([0x26, 0x00])
+    packet += bytearray(struct.pack('<H', len(array)))
+    packet += array
+    packet += bytearray([0x0d, 0x05])
+
+    remainder = (len(packet) + 4) % 16
+    if remainder:
+        packet += bytearray(16 - remainder)
+    return packet
+
+
+def make_pronto(once, repeats, seed=0):
+    """Build a NEC-like Pronto code with the given burst pair counts."""
+    rnd = random.Random(seed)
+    words = [0x0000, 0x006D, once, repeats]
+    for _ in range(once + repeats):
+        words.append(rnd.choice([0x0016, 0x0041, 0x0156, 0x00AB]))
+        words.append(rnd.choice([0x0016, 0x0041, 0x05F7, 0x0E4C]))
+    return struct.pack(">%dH" % len(words), *words)
+
+
+def check(pronto):
+    pulses = transcoder.pronto2lirc(pronto)
+    assert pulses == legacy_pronto2lirc(pronto)
+    assert transcoder.lirc2broadlink(pulses) == legacy_lirc2broadlink(pulses)
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"  {label:<10} {number / seconds:12.0f} codes/s")
+
+
+def main():
+    for once, repeats in ((34, 0), (34, 50), (34, 500)):
+        pronto = make_pronto(once, repeats, seed=once + repeats)
+        check(pronto)
+        number = max(20, 20000 // (once + repeats))
+
+        print(f"pronto2lirc, {once} + {repeats} burst pairs")
+        bench("legacy", lambda: legacy_pronto2lirc(pronto), number)
+        bench("current", lambda: transcoder.pronto2lirc(pronto), number)
+
+        pulses = transcoder.pronto2lirc(pronto)
+        print(f"lirc2broadlink, {len(pulses)} pulses")
+        bench("legacy", lambda: legacy_lirc2broadlink(pulses), number)
+        bench("current", lambda: transcoder.lirc2broadlink(pulses), number)
+
+
+if __name__ == "__main__":
+    main()
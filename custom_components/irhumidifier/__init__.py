@@ -1,13 +1,8 @@
 import os.path
 import logging
-import binascii
-import struct
-import aiofiles
-import aiohttp
-from aiohttp import ClientSession
-from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
-from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import config_per_platform
+from homeassistant.helpers.typing import ConfigType
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -16,14 +11,44 @@ DOMAIN = 'irhumidifier'
 COMPONENT_ABS_DIR = os.path.dirname(
     os.path.abspath(__file__))
 
+CONF_CODES_SOURCE = 'codes_source'
+
+
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the SmartIR component."""
-    conf = config.get(DOMAIN)
+    from .const import CODES_SOURCE
+    from .registry import get_registry
+
+    conf = config.get(DOMAIN) or {}
+    registry = get_registry(hass, conf.get(CONF_CODES_SOURCE, CODES_SOURCE))
+
+    # Fetch the code files of every configured humidifier at once instead
+    # of one by one as the platforms are set up.
+    device_codes = [
+        platform_config['device_code']
+        for platform, platform_config in config_per_platform(config, 'humidifier')
+        if platform == DOMAIN and 'device_code' in platform_config
+    ]
+    if device_codes:
+        hass.async_create_task(_async_prefetch(registry, device_codes))
     return True
 
+
+async def _async_prefetch(registry, device_codes):
+    try:
+        await registry.sync.async_ensure(device_codes)
+    except Exception as e:
+        _LOGGER.warning("Couldn't prefetch the device Json files: %s", e)
+
 class Helper():
+    # The downloader and the transcoders are rarely used, their modules are
+    # only loaded when called so they don't weigh on the setup.
+
     @staticmethod
     async def downloader(source, dest):
+        import aiofiles
+        import aiohttp
+
         async with aiohttp.ClientSession() as session:
             async with session.get(source) as response:
                 if response.status == 200:
@@ -34,36 +59,18 @@ class Helper():
 
     @staticmethod
     def pronto2lirc(pronto):
-        codes = [int(binascii.hexlify(pronto[i:i+2]), 16) for i in range(0, len(pronto), 2)]
-
-        if codes[0]:
-            raise ValueError("Pronto code should start with 0000")
-        if len(codes) != 4 + 2 * (codes[2] + codes[3]):
-            raise ValueError("Number of pulse widths does not match the preamble")
+        from . import transcoder
 
-        frequency = 1 / (codes[1] * 0.241246)
-        return [int(round(code / frequency)) for code in codes[4:]]
+        return transcoder.pronto2lirc(pronto)
 
     @staticmethod
     def lirc2broadlink(pulses):
-        array = bytearray()
-
-        for pulse in pulses:
-            pulse = int(pulse * 269 / 8192)
-
-            if pulse < 256:
-                array += bytearray(struct.pack('>B', pulse))
-            else:
-                array += bytearray([0x00])
-                array += bytearray(struct.pack('>H', pulse))
-
-        packet = bytearray([0x26, 0x00])
-        packet += bytearray(struct.pack('<H', len(array)))
-        packet += array
-        packet += bytearray([0x0d, 0x05])
-
-        # Add 0s to make ultimate packet size a multiple of 16 for 128-bit AES encryption.
-        remainder = (len(packet) + 4) % 16
-        if remainder:
-            packet += bytearray(16 - remainder)
-        return packet
\ No newline at end of file
+        from . import transcoder
+
+        return transcoder.lirc2broadlink(pulses)
+
+    @staticmethod
+    def broadlink2lirc(packet):
+        from . import transcoder
+
+        return transcoder.broadlink2lirc(packet)
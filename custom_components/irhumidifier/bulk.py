@@ -0,0 +1,106 @@
+"""Bring many humidifiers to their desired states in one call."""
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+import logging
+import time
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_ENTITIES = "entities"
+
+
+def get_entities(hass: HomeAssistant) -> dict:
+    """Return the humidifiers of the integration keyed by entity ID."""
+    return hass.data.setdefault(DOMAIN, {}).setdefault(DATA_ENTITIES, {})
+
+
+async def async_apply_states(hass: HomeAssistant, targets: list[dict]) -> dict:
+    """Bring the humidifiers of targets to their end states.
+
+    Every command sequence is planned before anything is sent. Entities
+    are then grouped by the blasters they transmit through; the groups run
+    concurrently, the entities of a group one after the other. Returns a
+    report with the outcome and the timings of every entity, in seconds
+    since the call.
+    """
+    started = time.monotonic()
+    entities = get_entities(hass)
+    report = {}
+
+    requested = {}
+    for target in targets:
+        fields = {key: value for key, value in target.items() if key != ATTR_ENTITY_ID}
+        for entity_id in target[ATTR_ENTITY_ID]:
+            # The last end state given for an entity wins.
+            requested[entity_id] = fields
+
+    groups = defaultdict(list)
+    for entity_id, fields in requested.items():
+        entity = entities.get(entity_id)
+        if entity is None:
+            report[entity_id] = _failure(f"{entity_id} is not an IR humidifier")
+            continue
+        try:
+            plan = entity.plan_target(**fields)
+        except Exception as e:
+            report[entity_id] = _failure(str(e))
+            continue
+        groups[entity.blasters].append((entity, plan))
+
+    await asyncio.gather(
+        *(
+            _async_run_group(blasters, plans, started, report)
+            for blasters, plans in groups.items()
+        )
+    )
+
+    elapsed = time.monotonic() - started
+    failed = sorted(entity_id for entity_id, result in report.items() if not result["success"])
+    _LOGGER.info(
+        "Applied the states of %d humidifiers through %d blaster groups in %.2f s, %d failed",
+        len(report),
+        len(groups),
+        elapsed,
+        len(failed),
+    )
+    return {
+        "elapsed": elapsed,
+        "succeeded": len(report) - len(failed),
+        "failed": failed,
+        "entities": report,
+    }
+
+
+async def _async_run_group(blasters, plans, started: float, report: dict) -> None:
+    for entity, plan in plans:
+        began = time.monotonic()
+        error = None
+        try:
+            commands, sent = await entity.async_execute_plan(plan)
+        except Exception as e:
+            _LOGGER.exception(e)
+            commands, sent, error = plan.commands, [], str(e)
+        finished = time.monotonic()
+        if error is None and len(sent) < len(commands):
+            error = "The command sequence was not transmitted completely"
+        report[entity.entity_id] = {
+            "success": error is None,
+            "error": error,
+            "blasters": list(blasters),
+            "commands": list(commands),
+            "sent": list(sent),
+            "queued": began - started,
+            "duration": finished - began,
+            "completed": finished - started,
+        }
+
+
+def _failure(error: str) -> dict:
+    return {"success": False, "error": error, "commands": [], "sent": []}
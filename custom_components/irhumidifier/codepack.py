@@ -0,0 +1,244 @@
+"""Validate code files and compile them into one memory-mappable pack.
+
+Code files stay the authoring format. The pack holds the same device data
+with every command already decoded into its Broadlink packet, so looking
+up a device code only slices the mapped file.
+
+Layout, all integers little-endian::
+
+    header   magic "IRCP", version u16, reserved u16, device count u32
+    index    per device, sorted by code: code u32, metadata offset u32,
+             metadata length u32, commands offset u32, command count u32
+    commands per command: name offset u32, name length u32,
+             packet offset u32, packet length u32
+    blobs    Json metadata without the commands, command names, packets
+"""
+from __future__ import annotations
+
+from base64 import b64decode
+import binascii
+import bisect
+import json
+import mmap
+import os
+import struct
+
+from . import transcoder
+from .planner import DeviceModel
+
+PACK_FILE = "codes.pack"
+PACK_MAGIC = b"IRCP"
+PACK_VERSION = 1
+
+_HEADER = struct.Struct("<4sHHI")
+_DEVICE = struct.Struct("<IIIII")
+_COMMAND = struct.Struct("<IIII")
+
+ENCODINGS = ("Base64", "Hex", "Pronto")
+DEVICE_TYPES = ("humidifier", "dehumidifier")
+
+REQUIRED_FIELDS = {
+    "manufacturer": str,
+    "supportedModels": list,
+    "supportedController": str,
+    "commandsEncoding": str,
+    "minHumidity": int,
+    "maxHumidity": int,
+    "minManualSpeed": int,
+    "maxManualSpeed": int,
+    "type": str,
+    "extraFunctions": list,
+    "operationModes": list,
+    "commands": dict,
+}
+
+
+def decode_command(encoding: str, code: str) -> bytes:
+    """Decode a command of a code file into a Broadlink packet."""
+    if encoding == "Hex":
+        packet = binascii.unhexlify(code)
+    elif encoding == "Pronto":
+        pulses = transcoder.pronto2lirc(bytearray.fromhex(code.replace(" ", "")))
+        packet = bytes(transcoder.lirc2broadlink(pulses))
+    else:
+        packet = b64decode(code, validate=True)
+    check_broadlink_packet(packet)
+    return packet
+
+
+def check_broadlink_packet(packet: bytes) -> None:
+    """Raise ValueError unless packet is a well framed Broadlink IR packet."""
+    transcoder.broadlink2ticks(packet)
+    (length,) = struct.unpack_from("<H", packet, 2)
+    end = 4 + length
+    trailer = transcoder.BROADLINK_TRAILER
+    # Learned packets count the trailer in their length, generated ones don't.
+    if trailer not in (
+        packet[end - len(trailer) : end],
+        packet[end : end + len(trailer)],
+    ):
+        raise ValueError("Broadlink packet is missing its trailer")
+
+
+def compile_device(data: dict) -> tuple[dict, list[str]]:
+    """Return the packets of a code file and the problems found in it."""
+    errors = []
+    for field, kind in REQUIRED_FIELDS.items():
+        if field not in data:
+            errors.append(f"missing field '{field}'")
+        elif not isinstance(data[field], kind):
+            errors.append(f"field '{field}' should be a {kind.__name__}")
+    if errors:
+        return {}, errors
+
+    encoding = data["commandsEncoding"]
+    if encoding not in ENCODINGS:
+        errors.append(f"unknown commandsEncoding '{encoding}'")
+    if data["type"] not in DEVICE_TYPES:
+        errors.append(f"unknown type '{data['type']}'")
+    if data["minHumidity"] > data["maxHumidity"]:
+        errors.append("minHumidity is above maxHumidity")
+
+    packets = {}
+    if encoding in ENCODINGS:
+        for name, code in data["commands"].items():
+            try:
+                packets[name] = decode_command(encoding, code)
+            except (ValueError, TypeError, binascii.Error) as e:
+                errors.append(f"command '{name}': {e}")
+
+    try:
+        DeviceModel.from_device_data(data)
+    except Exception as e:
+        errors.append(f"commandTypes: {e}")
+    return packets, errors
+
+
+def build_pack(devices: dict[int, tuple[dict, dict]]) -> bytes:
+    """Serialize devices, mapping codes to their data and packets, into a pack."""
+    codes = sorted(devices)
+    index_size = _HEADER.size + _DEVICE.size * len(codes)
+    tables_size = _COMMAND.size * sum(len(devices[c][1]) for c in codes)
+
+    index = bytearray(index_size)
+    tables = bytearray()
+    blobs = bytearray()
+    blob_offset = index_size + tables_size
+
+    _HEADER.pack_into(index, 0, PACK_MAGIC, PACK_VERSION, 0, len(codes))
+    for position, code in enumerate(codes):
+        data, packets = devices[code]
+        metadata = json.dumps(
+            {k: v for k, v in data.items() if k != "commands"}, separators=(",", ":")
+        ).encode("utf-8")
+        metadata_offset = blob_offset + len(blobs)
+        blobs += metadata
+
+        table_offset = index_size + len(tables)
+        for name, packet in packets.items():
+            encoded = name.encode("utf-8")
+            name_offset = blob_offset + len(blobs)
+            blobs += encoded
+            packet_offset = blob_offset + len(blobs)
+            blobs += packet
+            tables += _COMMAND.pack(name_offset, len(encoded), packet_offset, len(packet))
+
+        _DEVICE.pack_into(
+            index,
+            _HEADER.size + position * _DEVICE.size,
+            code,
+            metadata_offset,
+            len(metadata),
+            table_offset,
+            len(packets),
+        )
+
+    return bytes(index + tables + blobs)
+
+
+def compile_pack(codes_dir: str, output: str | None = None) -> tuple[int, dict]:
+    """Validate every code file of a directory and write the pack.
+
+    Returns the number of packed devices and the problems per file. The
+    pack is only written when no file has problems.
+    """
+    devices = {}
+    problems = {}
+    for name in sorted(os.listdir(codes_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext != ".json" or not stem.isdigit():
+            continue
+        try:
+            with open(os.path.join(codes_dir, name)) as j:
+                data = json.load(j)
+        except ValueError as e:
+            problems[name] = [f"invalid Json: {e}"]
+            continue
+        packets, errors = compile_device(data)
+        if errors:
+            problems[name] = errors
+        else:
+            devices[int(stem)] = (data, packets)
+
+    if not problems:
+        output = output or os.path.join(codes_dir, PACK_FILE)
+        temp = f"{output}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(build_pack(devices))
+        os.replace(temp, output)
+    return len(devices), problems
+
+
+class CodePack:
+    """Read-only view of a pack, usually backed by a memory map."""
+
+    def __init__(self, buffer, mtime: float = 0.0):
+        self.mtime = mtime
+        self._buffer = memoryview(buffer)
+        magic, version, _, count = _HEADER.unpack_from(self._buffer)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError("Not a code pack of a supported version")
+        self._codes = [
+            _DEVICE.unpack_from(self._buffer, _HEADER.size + i * _DEVICE.size)[0]
+            for i in range(count)
+        ]
+
+    @classmethod
+    def open(cls, path: str) -> CodePack:
+        """Map a pack file into memory."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(mapped, os.fstat(f.fileno()).st_mtime)
+
+    def __contains__(self, device_code) -> bool:
+        return self._position(device_code) is not None
+
+    def __iter__(self):
+        return iter(self._codes)
+
+    def _position(self, device_code):
+        position = bisect.bisect_left(self._codes, device_code)
+        if position < len(self._codes) and self._codes[position] == device_code:
+            return position
+        return None
+
+    def device_data(self, device_code: int) -> dict:
+        """Return the data of a device code, its commands being packet views."""
+        position = self._position(device_code)
+        if position is None:
+            raise KeyError(device_code)
+
+        buffer = self._buffer
+        _, metadata_offset, metadata_length, table_offset, count = _DEVICE.unpack_from(
+            buffer, _HEADER.size + position * _DEVICE.size
+        )
+        data = json.loads(bytes(buffer[metadata_offset : metadata_offset + metadata_length]))
+        commands = {}
+        for offset in range(table_offset, table_offset + count * _COMMAND.size, _COMMAND.size):
+            name_offset, name_length, packet_offset, packet_length = _COMMAND.unpack_from(
+                buffer, offset
+            )
+            name = str(buffer[name_offset : name_offset + name_length], "utf-8")
+            commands[name] = buffer[packet_offset : packet_offset + packet_length]
+        data["commands"] = commands
+        return data
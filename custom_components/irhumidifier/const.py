@@ -21,6 +21,35 @@ DEFAULT_MANUAL_SPEED = 4
 
 CURRENT_SPEED = "current_speed"
 DEFAULT_DELAY = 0.5
+INTENT_DEBOUNCE = 0.3
+TASK_CONCURRENCY = 2
+TASK_BACKLOG = 8
+METRICS_WINDOW = 256
+
+SEND_TIMEOUT = 10
+SEND_RETRIES = 2
+SEND_BACKOFF = 0.2
+
+DEFAULT_HEDGE_BUDGET = 0.25
+TARGET_MAX_FAILURES = 3
+TARGET_SLOW_LATENCY = 2.0
+TARGET_COOLDOWN = 60
+
+CODES_SOURCE = "https://raw.githubusercontent.com/irakhlin/IRHumidifier/main/codes/"
+SYNC_CONCURRENCY = 4
+SYNC_CHUNK_SIZE = 16384
+SYNC_TIMEOUT = 30
+
+DEFAULT_POWER_THRESHOLD = 2.0
+RECONCILE_SETTLE = 10
+RECONCILE_GRACE = 30
+RECONCILE_RETRIES = 2
+
+CALIBRATION_MIN_DELAY = 0.05
+CALIBRATION_ITERATIONS = 5
+CALIBRATION_SETTLE = 5.0
+CALIBRATION_TOLERANCE = 0.1
+CALIBRATION_CONFIRM_TIMEOUT = 300
 
 COMMAND_INCREASE = "increase"
 COMMAND_DECREASE = "decrease"
@@ -1,98 +1,416 @@
 from abc import ABC, abstractmethod
-from base64 import b64encode
+import asyncio
+from base64 import b64decode, b64encode
 import binascii
 import logging
+import random
+import time
 
 from homeassistant.const import ATTR_ENTITY_ID
-from . import Helper
+from . import transcoder
+from .metrics import METRIC_ENCODE, METRIC_SERVICE_CALL, METRIC_SLEEP, Recorder
+from .const import SEND_BACKOFF, SEND_RETRIES, SEND_TIMEOUT
+from .targets import BlasterTimeout, CircuitOpen, TargetSet
 
 _LOGGER = logging.getLogger(__name__)
 
 BROADLINK_CONTROLLER = "Broadlink"
+MQTT_CONTROLLER = "MQTT"
+ESPHOME_CONTROLLER = "ESPHome"
+RAW_CONTROLLER = "Raw"
 
 ENC_BASE64 = "Base64"
 ENC_HEX = "Hex"
 ENC_PRONTO = "Pronto"
 
-BROADLINK_COMMANDS_ENCODING = [ENC_BASE64, ENC_HEX, ENC_PRONTO]
+COMMANDS_ENCODING = [ENC_BASE64, ENC_HEX, ENC_PRONTO]
 
+FORMAT_BROADLINK = "broadlink"
+FORMAT_PRONTO = "pronto"
+FORMAT_SIGNED_PULSES = "signed_pulses"
+FORMAT_PULSES = "pulses"
 
-def get_controller(hass, controller, encoding, controller_data, delay):
+# Controller backends by the name used in code files and the configuration.
+CONTROLLERS = {}
+
+
+def register_controller(name):
+    """Class decorator adding a controller backend to the registry."""
+
+    def register(controller_class):
+        CONTROLLERS[name] = controller_class
+        return controller_class
+
+    return register
+
+
+class SendError(Exception):
+    """A sequence of commands was not transmitted completely."""
+
+    def __init__(self, message, sent=()):
+        super().__init__(message)
+        # The commands of the sequence that were transmitted before the failure.
+        self.sent = list(sent)
+
+
+def get_controller(
+    hass,
+    controller,
+    encoding,
+    controller_data,
+    delay,
+    code_set,
+    merge=False,
+    timing=None,
+    metrics=None,
+):
     """Return a controller compatible with the specification provided."""
-    controllers = {BROADLINK_CONTROLLER: BroadlinkController}
     try:
-        return controllers[controller](
-            hass, controller, encoding, controller_data, delay
-        )
+        controller_class = CONTROLLERS[controller]
     except KeyError:
-        raise Exception("The controller is not supported.")
+        raise Exception(f"The controller '{controller}' is not supported.")
+    return controller_class(
+        hass,
+        controller,
+        encoding,
+        controller_data,
+        delay,
+        code_set,
+        merge,
+        timing,
+        metrics,
+    )
 
 
 class AbstractController(ABC):
-    """Representation of a controller."""
+    """Representation of a controller.
 
-    def __init__(self, hass, controller, encoding, controller_data, delay):
+    Commands of every code file encoding are decoded into Broadlink
+    packets, the canonical form, and transcoded once into the native
+    format of the backend, which is all a send looks up.
+    """
+
+    # Whether transmit() accepts several payloads and spaces them itself.
+    supports_batch = False
+    # Format of the payloads produced by serialize().
+    native_format = FORMAT_BROADLINK
+
+    def __init__(
+        self,
+        hass,
+        controller,
+        encoding,
+        controller_data,
+        delay,
+        code_set,
+        merge=False,
+        timing=None,
+        metrics=None,
+    ):
         self.check_encoding(encoding)
         self.hass = hass
         self._controller = controller
         self._encoding = encoding
-        self._controller_data = controller_data
+        if not isinstance(controller_data, TargetSet):
+            controller_data = TargetSet(hass, controller_data)
+        self._targets = controller_data
         self._delay = delay
+        self._merge = merge
+        self._timing = timing
+        self._metrics = Recorder() if metrics is None else metrics
+        self._last_command = None
+        self._last_sent = 0.0
+        # Packets and payloads only depend on the controller type and the
+        # encoding, so every controller using the same code set shares them.
+        self._table = code_set.compiled((type(self), encoding), self.compile)
+        for command in self._table:
+            self.payload(command)
 
-    @abstractmethod
     def check_encoding(self, encoding):
         """Check if the encoding is supported by the controller."""
+        if encoding not in COMMANDS_ENCODING:
+            raise Exception(
+                f"The encoding is not supported by the {self.__class__.__name__}."
+            )
+
+    def compile(self, commands):
+        """Decode every command of a code set into its Broadlink packet."""
+        packets = {}
+        for name, code in commands.items():
+            try:
+                packets[name] = self.encode(code)
+            except Exception as e:
+                raise Exception(f"Invalid code for command '{name}': {e}")
+        return packets
+
+    def encode(self, code):
+        """Convert a code from the code set into a Broadlink packet."""
+        if not isinstance(code, str):
+            # Code packs hold packets decoded at build time.
+            return code
+
+        if self._encoding == ENC_HEX:
+            try:
+                return binascii.unhexlify(code)
+            except:
+                raise Exception("Error while converting " "Hex to Base64 encoding")
+
+        if self._encoding == ENC_PRONTO:
+            try:
+                code = code.replace(" ", "")
+                code = bytearray.fromhex(code)
+                code = transcoder.pronto2lirc(code)
+                return bytes(transcoder.lirc2broadlink(code))
+            except:
+                raise Exception("Error while converting " "Pronto to Base64 encoding")
+
+        try:
+            return b64decode(code, validate=True)
+        except binascii.Error:
+            raise Exception("Error while decoding Base64 encoding")
+
+    def payload(self, command):
+        """Return the payload of a command in the native format of the backend."""
+        return self._table.encoded(command, self.serialize)
+
+    @staticmethod
+    @abstractmethod
+    def serialize(packet):
+        """Convert a Broadlink packet into the native format of the backend."""
         pass
 
     @abstractmethod
-    async def send(self, command):
-        """Send a command."""
+    async def transmit(self, target, payloads, delay):
+        """Transmit payloads spaced by delay through one blaster."""
         pass
 
+    async def send(self, command, delay=None):
+        """Send a command, or a list of commands spaced by delay."""
+        if not isinstance(command, list):
+            command = [command]
+        if delay is None:
+            delay = self._delay
 
-class BroadlinkController(AbstractController):
-    """Controls a Broadlink device."""
+        with self._metrics.timer(METRIC_ENCODE):
+            payloads = [self.payload(_command) for _command in command]
+        _LOGGER.debug("sending commands: %s", command)
 
-    def check_encoding(self, encoding):
-        """Check if the encoding is supported by the controller."""
-        if encoding not in BROADLINK_COMMANDS_ENCODING:
-            raise Exception(
-                "The encoding is not supported " "by the Broadlink controller."
+        with self._metrics.timer(METRIC_SERVICE_CALL):
+            await self._async_deliver(
+                lambda target: self.transmit(target, payloads, delay),
+                delay * (len(payloads) - 1),
             )
 
-    async def send(self, command):
-        """Send a command."""
-        commands = []
+    def merge(self, commands, gaps):
+        """Return a single payload transmitting the whole sequence."""
+        commands = tuple(commands)
+        gaps = tuple(gaps)
 
-        if not isinstance(command, list):
-            command = [command]
+        def build():
+            packets = [self._table.packet(command) for command in commands]
+            packet = transcoder.broadlink_sequence(
+                packets, [gap * 1000000 for gap in gaps]
+            )
+            return self.serialize(packet)
 
-        for _command in command:
-            if self._encoding == ENC_HEX:
-                try:
-                    _command = binascii.unhexlify(_command)
-                    _command = b64encode(_command).decode("utf-8")
-                except:
-                    raise Exception("Error while converting " "Hex to Base64 encoding")
+        return self._table.derived(("merge", commands, gaps), build)
+
+    def gap(self, previous, following):
+        """Return the gap the device needs between two commands."""
+        if self._timing is None:
+            return self._delay
+        return self._timing.gap(previous, following, self._delay)
+
+    def gaps(self, commands):
+        """Return the gaps between consecutive commands of a sequence."""
+        if self._timing is None:
+            return [self._delay] * (len(commands) - 1)
+        return self._timing.gaps(commands, self._delay)
+
+    @property
+    def last_sent(self):
+        """Monotonic time of the last transmission."""
+        return self._last_sent
+
+    async def async_wait_ready(self, command):
+        """Wait until the device can receive a command after the last one."""
+        if self._last_command is None:
+            return
+        ready = self._last_sent + self.gap(self._last_command, command)
+        remaining = ready - time.monotonic()
+        if remaining > 0:
+            self._metrics.record(METRIC_SLEEP, remaining)
+            await asyncio.sleep(remaining)
 
-            if self._encoding == ENC_PRONTO:
+    def _mark_sent(self, command):
+        self._last_command = command
+        self._last_sent = time.monotonic()
+
+    async def _async_deliver(self, call, duration=0.0):
+        """Await call(target) through the targets with a timeout and retries.
+
+        Failures are retried with a jittered exponential backoff. Timeouts
+        are not, as the blaster may have fired anyway and toggles must not
+        be sent twice; neither are calls failed fast by an open breaker.
+        """
+        for attempt in range(SEND_RETRIES + 1):
+            try:
+                await self._targets.async_call(call, SEND_TIMEOUT + duration, duration)
+                return
+            except (BlasterTimeout, CircuitOpen):
+                raise
+            except Exception as e:
+                if attempt == SEND_RETRIES:
+                    raise
+                backoff = SEND_BACKOFF * 2**attempt * random.uniform(0.5, 1.5)
+                _LOGGER.debug(
+                    "Sending through %s failed (%s), retrying in %.2f s",
+                    self._targets,
+                    e,
+                    backoff,
+                )
+                await asyncio.sleep(backoff)
+
+    async def send_sequence(self, commands, gaps=None):
+        """Send a sequence of commands spaced by the gaps of the timing profile.
+
+        With merging, the sequence is transmitted as a single payload.
+        Raises SendError listing the commands sent when the sequence fails.
+        """
+        commands = list(commands)
+        if gaps is None:
+            gaps = self.gaps(commands)
+
+        if self._merge and len(commands) > 1:
+            _LOGGER.debug("sending merged commands: %s", commands)
+            with self._metrics.timer(METRIC_ENCODE):
+                payload = self.merge(commands, gaps)
+            with self._metrics.timer(METRIC_SERVICE_CALL):
                 try:
-                    _command = _command.replace(" ", "")
-                    _command = bytearray.fromhex(_command)
-                    _command = Helper.pronto2lirc(_command)
-                    _command = Helper.lirc2broadlink(_command)
-                    _command = b64encode(_command).decode("utf-8")
-                except:
-                    raise Exception(
-                        "Error while converting " "Pronto to Base64 encoding"
+                    await self._async_deliver(
+                        lambda target: self.transmit(target, [payload], 0),
+                        sum(gaps),
                     )
+                except Exception as e:
+                    raise SendError(f"Sending {commands} failed: {e}") from e
+        elif self.supports_batch:
+            # The service spaces a batch with a single delay.
+            try:
+                await self.send(commands, max(gaps, default=0))
+            except Exception as e:
+                raise SendError(f"Sending {commands} failed: {e}") from e
+        else:
+            for index, command in enumerate(commands):
+                if index:
+                    self._metrics.record(METRIC_SLEEP, gaps[index - 1])
+                    await asyncio.sleep(gaps[index - 1])
+                try:
+                    await self.send(command)
+                except Exception as e:
+                    if index:
+                        self._mark_sent(commands[index - 1])
+                    raise SendError(
+                        f"Sending {command} failed: {e}", commands[:index]
+                    ) from e
+        self._mark_sent(commands[-1])
+
+
+@register_controller(BROADLINK_CONTROLLER)
+class BroadlinkController(AbstractController):
+    """Controls a Broadlink device through remote.send_command."""
+
+    supports_batch = True
+    native_format = FORMAT_BROADLINK
+
+    @staticmethod
+    def serialize(packet):
+        """Convert a Broadlink packet into a remote.send_command payload."""
+        return "b64:" + b64encode(packet).decode("utf-8")
+
+    async def transmit(self, target, payloads, delay):
+        """Call remote.send_command with every payload in one batch."""
+        await self.hass.services.async_call(
+            "remote",
+            "send_command",
+            {ATTR_ENTITY_ID: target, "command": payloads, "delay_secs": delay},
+        )
+
+
+class SequentialController(AbstractController):
+    """Controller of a service taking one payload per call."""
+
+    async def transmit(self, target, payloads, delay):
+        """Call the service once per payload, sleeping delay in between."""
+        for index, payload in enumerate(payloads):
+            if index:
+                await asyncio.sleep(delay)
+            await self.call(target, payload)
+
+    @abstractmethod
+    async def call(self, target, payload):
+        """Transmit one payload through a blaster."""
+        pass
+
+
+@register_controller(MQTT_CONTROLLER)
+class MQTTController(SequentialController):
+    """Publishes Pronto codes to the MQTT topic of a blaster."""
+
+    native_format = FORMAT_PRONTO
+
+    @staticmethod
+    def serialize(packet):
+        """Convert a Broadlink packet into a Pronto hex code."""
+        return transcoder.broadlink2pronto(packet)
+
+    async def call(self, target, payload):
+        """Publish a payload to the topic of a blaster."""
+        await self.hass.services.async_call(
+            "mqtt", "publish", {"topic": target, "payload": payload}
+        )
+
+
+@register_controller(ESPHOME_CONTROLLER)
+class ESPHomeController(SequentialController):
+    """Calls the ESPHome service of a remote_transmitter with raw pulses."""
 
-            commands.append("b64:" + _command)
-            _LOGGER.error(f"sending command: {_command}")
-        service_data = {
-            ATTR_ENTITY_ID: self._controller_data,
-            "command": commands,
-            "delay_secs": self._delay,
-        }
+    native_format = FORMAT_SIGNED_PULSES
 
-        await self.hass.services.async_call("remote", "send_command", service_data)
+    @staticmethod
+    def serialize(packet):
+        """Convert a Broadlink packet into marks and negative spaces."""
+        return transcoder.broadlink2raw(packet)
+
+    async def call(self, target, payload):
+        """Call the esphome.<target> service with the pulses as command."""
+        await self.hass.services.async_call(
+            "esphome", target, {"command": payload}
+        )
+
+
+@register_controller(RAW_CONTROLLER)
+class RawController(SequentialController):
+    """Calls any service taking pulse widths, the target being domain.service."""
+
+    native_format = FORMAT_PULSES
+
+    def __init__(self, hass, controller, encoding, controller_data, *args, **kwargs):
+        targets = getattr(controller_data, "targets", controller_data)
+        for target in [targets] if isinstance(targets, str) else targets:
+            if "." not in target:
+                raise Exception(
+                    f"The raw controller target '{target}' should be domain.service."
+                )
+        super().__init__(hass, controller, encoding, controller_data, *args, **kwargs)
+
+    @staticmethod
+    def serialize(packet):
+        """Convert a Broadlink packet into pulse widths in microseconds."""
+        return transcoder.broadlink2pulses(packet)
+
+    async def call(self, target, payload):
+        """Call the target service with the pulses as timings."""
+        domain, service = target.split(".", 1)
+        await self.hass.services.async_call(
+            domain, service, {"timings": payload}
+        )
@@ -0,0 +1,38 @@
+"""Collect the runtime statistics of the integration."""
+from __future__ import annotations
+
+import json
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .metrics import get_metrics
+from .registry import DATA_REGISTRY
+from .scheduler import get_scheduler
+from .targets import get_health_registry
+
+DIAGNOSTICS_FILE = "irhumidifier_diagnostics.json"
+
+
+def get_diagnostics(hass: HomeAssistant) -> dict:
+    """Return metrics, blaster queues and health, and cached code sets."""
+    registry = hass.data.get(DOMAIN, {}).get(DATA_REGISTRY)
+    return {
+        "metrics": get_metrics(hass).summary(),
+        "scheduler": get_scheduler(hass).stats(),
+        "blasters": get_health_registry(hass).stats(),
+        "code_sets": [] if registry is None else registry.cached(),
+    }
+
+
+async def async_dump_diagnostics(hass: HomeAssistant, path: str | None = None) -> str:
+    """Write the diagnostics as Json into the configuration directory."""
+    path = path or hass.config.path(DIAGNOSTICS_FILE)
+    data = json.dumps(get_diagnostics(hass), indent=2, default=str)
+
+    def write():
+        with open(path, "w") as f:
+            f.write(data)
+
+    await hass.async_add_executor_job(write)
+    return path
@@ -1,22 +1,18 @@
 from __future__ import annotations
 
 from abc import ABC
-from datetime import timedelta
+from dataclasses import replace
 from typing import Any
-import attr
 
 import asyncio
-import json
 import logging
-import os.path
+import time
 
-from homeassistant.components.demo import humidifier
-from homeassistant.core import HomeAssistant, ServiceCall, callback, State
+from homeassistant.core import ServiceCall, SupportsResponse, callback
 from homeassistant.helpers.typing import (
     ConfigType,
     DiscoveryInfoType,
     HomeAssistantType,
-    ServiceDataType,
 )
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
@@ -29,21 +25,15 @@ from homeassistant.components.humidifier import (
 )
 from homeassistant.components.humidifier.const import (
     ATTR_HUMIDITY,
-    DEFAULT_MAX_HUMIDITY,
-    DEFAULT_MIN_HUMIDITY,
     SUPPORT_MODES,
-    MODE_BABY,
     MODE_AUTO,
     MODE_NORMAL,
-    MODE_COMFORT,
 )
 
-from homeassistant.helpers.dispatcher import (
-    async_dispatcher_send,
-    async_dispatcher_connect,
-)
 from homeassistant.const import (
+    ATTR_ENTITY_ID,
     CONF_NAME,
+    Platform,
     STATE_ON,
     STATE_OFF,
     STATE_UNKNOWN,
@@ -51,28 +41,45 @@ from homeassistant.const import (
 )
 from homeassistant.helpers import (
     config_validation as cv,
+    discovery,
     entity_platform,
-    device_registry,
-    service,
-    entity,
+)
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_state_change_event,
 )
 from homeassistant.helpers.restore_state import RestoreEntity
-from .controller import get_controller
-from . import COMPONENT_ABS_DIR, Helper
+from .controller import CONTROLLERS, SendError, get_controller
+from .bulk import async_apply_states, get_entities
+from .metrics import METRIC_LOCK_WAIT, METRIC_SEQUENCE_LENGTH, get_metrics
+from .planner import COMMAND_OFF, DeviceState, Plan, TargetState
+from .registry import CodeSet, get_registry
+from .publisher import StatePublisher
+from .scheduler import PRIORITY_MODE, PRIORITY_POWER, PRIORITY_STEP, get_scheduler
+from .targets import POLICIES, POLICY_FANOUT, TargetSet
+from .tasks import EntityTaskManager
+from .timing import TimingProfile, async_calibrate, get_timing_store
 
 from .const import (
     DEFAULT_HUMIDITY,
-    DEFAULT_MANUAL_SPEED,
     HUMIDIFIER_FUNCTIONS,
-    COMMAND_WARM_MIST,
-    COMMAND_UV,
-    COMMAND_LIGHT,
     COMMAND_DECREASE,
     COMMAND_INCREASE,
-    COMMAND_NIGHT_MODE,
     CURRENT_SPEED,
     DOMAIN,
     DEFAULT_DELAY,
+    INTENT_DEBOUNCE,
+    CALIBRATION_CONFIRM_TIMEOUT,
+    CALIBRATION_ITERATIONS,
+    CALIBRATION_MIN_DELAY,
+    CALIBRATION_SETTLE,
+    CALIBRATION_TOLERANCE,
+    DEFAULT_POWER_THRESHOLD,
+    DEFAULT_HEDGE_BUDGET,
+    RECONCILE_GRACE,
+    RECONCILE_RETRIES,
+    RECONCILE_SETTLE,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -85,19 +92,63 @@ SERVICE_INCREASE = "increase"
 SERVICE_DECREASE = "decrease"
 SERVICE_SET_SPEED = "set_speed"
 SERVICE_SYNC_STATE = "sync_state"
+SERVICE_CALIBRATE_DELAY = "calibrate_delay"
+SERVICE_CONFIRM_CALIBRATION = "confirm_calibration"
+SERVICE_DUMP_DIAGNOSTICS = "dump_diagnostics"
+SERVICE_SET_STATES = "set_states"
 CONF_UNIQUE_ID = "unique_id"
 CONF_DEVICE_CODE = "device_code"
+CONF_CONTROLLER = "controller"
 CONF_CONTROLLER_DATA = "controller_data"
+CONF_CONTROLLER_POLICY = "controller_policy"
+CONF_HEDGE_BUDGET = "hedge_budget"
 CONF_DELAY = "delay"
+CONF_MERGE_COMMANDS = "merge_commands"
+CONF_HUMIDITY_SENSOR = "humidity_sensor"
+CONF_POWER_SENSOR = "power_sensor"
+CONF_POWER_THRESHOLD = "power_threshold"
+CONF_DIAGNOSTIC_SENSOR = "diagnostic_sensor"
 SUPPORTED_FEATURES = SUPPORT_MODES
 
+ATTR_TARGETS = "targets"
+
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
         vol.Required(CONF_UNIQUE_ID): cv.string,
         vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
         vol.Required(CONF_DEVICE_CODE): cv.positive_int,
-        vol.Required(CONF_CONTROLLER_DATA): cv.string,
+        vol.Optional(CONF_CONTROLLER): vol.In(list(CONTROLLERS)),
+        vol.Required(CONF_CONTROLLER_DATA): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(CONF_CONTROLLER_POLICY, default=POLICY_FANOUT): vol.In(POLICIES),
+        vol.Optional(
+            CONF_HEDGE_BUDGET, default=DEFAULT_HEDGE_BUDGET
+        ): cv.positive_float,
         vol.Optional(CONF_DELAY, default=DEFAULT_DELAY): cv.positive_float,
+        vol.Optional(CONF_MERGE_COMMANDS, default=True): cv.boolean,
+        vol.Optional(CONF_HUMIDITY_SENSOR): cv.entity_id,
+        vol.Optional(CONF_POWER_SENSOR): cv.entity_id,
+        vol.Optional(
+            CONF_POWER_THRESHOLD, default=DEFAULT_POWER_THRESHOLD
+        ): vol.Coerce(float),
+        vol.Optional(CONF_DIAGNOSTIC_SENSOR, default=False): cv.boolean,
+    }
+)
+
+
+SET_STATES_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_TARGETS): [
+            {
+                vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+                vol.Optional("state"): vol.In([STATE_ON, STATE_OFF]),
+                vol.Optional("mode"): cv.string,
+                vol.Optional("humidity"): vol.Coerce(int),
+                vol.Optional("speed"): vol.All(
+                    vol.Coerce(int), vol.Range(min=1, max=7)
+                ),
+                vol.Optional("functions"): vol.All(cv.ensure_list, [cv.string]),
+            }
+        ]
     }
 )
 
@@ -109,50 +160,61 @@ async def async_setup_platform(
     discovery_info: DiscoveryInfoType | None = None,
 ):
 
-    device_code = config.get(CONF_DEVICE_CODE)
-    device_files_absdir = os.path.join(COMPONENT_ABS_DIR, "codes")
-
-    if not os.path.isdir(device_files_absdir):
-        os.makedirs(device_files_absdir)
+    try:
+        code_set = await get_registry(hass).async_get(config.get(CONF_DEVICE_CODE))
+        timing = await get_timing_store(hass).async_profile(
+            code_set.device_code, code_set.data.get("timing")
+        )
+        entity = IRHumidifier(hass, config, code_set, timing)
+    except Exception as e:
+        _LOGGER.error(e)
+        return
 
-    device_json_filename = str(device_code) + ".json"
-    device_json_path = os.path.join(device_files_absdir, device_json_filename)
+    async_add_entities([entity])
 
-    if not os.path.exists(device_json_path):
-        _LOGGER.warning(
-            "Couldn't find the device Json file. The component will "
-            "try to download it from the GitHub repo"
+    platform = entity_platform.async_get_current_platform()
+    if config.get(CONF_DIAGNOSTIC_SENSOR):
+        hass.async_create_task(
+            discovery.async_load_platform(
+                hass,
+                Platform.SENSOR,
+                platform.platform_name,
+                {
+                    CONF_UNIQUE_ID: entity.unique_id,
+                    CONF_NAME: entity.name,
+                    CONF_CONTROLLER_DATA: config.get(CONF_CONTROLLER_DATA),
+                },
+                {},
+            )
         )
 
-        try:
-            codes_source = (
-                "https://raw.githubusercontent.com/"
-                "irakhlin/IRHumidifier/main/"
-                "codes/{}.json"
-            )
+    if not hass.services.has_service(
+        platform.platform_name, SERVICE_DUMP_DIAGNOSTICS
+    ):
 
-            await Helper.downloader(codes_source.format(device_code), device_json_path)
-        except Exception:
-            _LOGGER.error(
-                "There was an error while downloading the device Json file. "
-                "Please check your internet connection or if the device code "
-                "exists on GitHub. If the problem still exists please "
-                "place the file manually in the proper directory."
-            )
-            return
+        async def async_dump(call: ServiceCall):
+            from .diagnostics import async_dump_diagnostics
 
-    with open(device_json_path) as j:
-        try:
-            device_data = json.load(j)
-        except Exception:
-            _LOGGER.error("The device Json file is invalid")
-            return
+            path = await async_dump_diagnostics(hass)
+            _LOGGER.info("Diagnostics have been written to %s", path)
 
-    _LOGGER.info("Device json file has been loaded from: {device_json_path}")
+        hass.services.async_register(
+            platform.platform_name, SERVICE_DUMP_DIAGNOSTICS, async_dump
+        )
 
-    async_add_entities([IRHumidifier(hass, config, device_data)])
+    if not hass.services.has_service(platform.platform_name, SERVICE_SET_STATES):
+
+        async def async_set_states(call: ServiceCall):
+            return await async_apply_states(hass, call.data[ATTR_TARGETS])
+
+        hass.services.async_register(
+            platform.platform_name,
+            SERVICE_SET_STATES,
+            async_set_states,
+            SET_STATES_SCHEMA,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
 
-    platform = entity_platform.async_get_current_platform()
     platform.async_register_entity_service(
         SERVICE_TOGGLE_FUNCTION,
         {vol.Required("function"): cv.string},
@@ -173,6 +235,25 @@ async def async_setup_platform(
         {vol.Required("speed"): vol.All(vol.Coerce(int), vol.Range(min=1, max=7))},
         "async_set_speed",
     )
+    platform.async_register_entity_service(
+        SERVICE_CALIBRATE_DELAY,
+        {
+            vol.Required("first"): cv.string,
+            vol.Required("second"): cv.string,
+            vol.Optional("sensor"): cv.entity_id,
+            vol.Optional("min_delay"): cv.positive_float,
+            vol.Optional("max_delay"): cv.positive_float,
+            vol.Optional("iterations"): vol.All(vol.Coerce(int), vol.Range(min=1, max=10)),
+            vol.Optional("settle"): cv.positive_float,
+            vol.Optional("tolerance"): cv.positive_float,
+        },
+        "async_calibrate_delay",
+    )
+    platform.async_register_entity_service(
+        SERVICE_CONFIRM_CALIBRATION,
+        {vol.Required("success"): cv.boolean},
+        "async_confirm_calibration",
+    )
     platform.async_register_entity_service(
         SERVICE_SYNC_STATE,
         {vol.Required("state"): cv.string},
@@ -181,7 +262,14 @@ async def async_setup_platform(
 
 
 class IRHumidifier(HumidifierEntity, RestoreEntity, ABC):
-    def __init__(self, hass: HomeAssistantType, config: ConfigType, device_data):
+    def __init__(
+        self,
+        hass: HomeAssistantType,
+        config: ConfigType,
+        code_set: CodeSet,
+        timing: TimingProfile | None = None,
+    ):
+        device_data = code_set.data
         self.hass = hass
         self._attr_unique_id = config.get(CONF_UNIQUE_ID)
         self._attr_name = config.get(CONF_NAME)
@@ -190,8 +278,9 @@ class IRHumidifier(HumidifierEntity, RestoreEntity, ABC):
         self._attr_supported_features = SUPPORTED_FEATURES
         self._attr_available_modes = list(device_data["operationModes"])
         self._attr_target_humidity = DEFAULT_HUMIDITY
+        self._attr_current_humidity = None
         self._attr_mode = MODE_NORMAL
-        self._state = STATE_OFF
+        self._state = False
         self._device_type = device_data["type"]
         if self._device_type == "humidifier":
             self._attr_device_class = HumidifierDeviceClass.HUMIDIFIER
@@ -199,95 +288,140 @@ class IRHumidifier(HumidifierEntity, RestoreEntity, ABC):
             self._attr_device_class = HumidifierDeviceClass.DEHUMIDIFIER
 
         self._device_code = config.get(CONF_DEVICE_CODE)
-        self._controller_data = config.get(CONF_CONTROLLER_DATA)
+        self._controller_data = TargetSet(
+            hass,
+            config.get(CONF_CONTROLLER_DATA),
+            config.get(CONF_CONTROLLER_POLICY, POLICY_FANOUT),
+            config.get(CONF_HEDGE_BUDGET, DEFAULT_HEDGE_BUDGET),
+        )
         self._delay: float = config.get(CONF_DELAY)
+        self._merge_commands: bool = config.get(CONF_MERGE_COMMANDS)
+        self._humidity_sensor = config.get(CONF_HUMIDITY_SENSOR)
+        self._power_sensor = config.get(CONF_POWER_SENSOR)
+        self._power_threshold = config.get(CONF_POWER_THRESHOLD, DEFAULT_POWER_THRESHOLD)
+        self._reconcile_unsub = None
+        self._reconcile_attempts = 0
+        # Monotonic time of the last transmission when it changed the power.
+        self._power_sent_at = None
         self._manufacturer = device_data["manufacturer"]
         self._supported_models = device_data["supportedModels"]
-        self._supported_controller = device_data["supportedController"]
+        # Codes are transcoded for the blaster, which may differ from the one
+        # the code file was learned with.
+        self._supported_controller = config.get(
+            CONF_CONTROLLER, device_data["supportedController"]
+        )
         self._commands_encoding = device_data["commandsEncoding"]
-        self._min_speed = int(device_data["minManualSpeed"])
-        self._max_speed = int(device_data["maxManualSpeed"])
-        self._default_speed = int(device_data["defaultManualSpeed"])
 
         self._supported_extra_functions = [
             x for x in device_data["extraFunctions"] if x in HUMIDIFIER_FUNCTIONS
         ]
-
-        self._commands = device_data["commands"]
-
-        self._attr_extra_state_attributes = {
-            "manufacturer": self._manufacturer,
-            "model": self._supported_models,
-            "default_humidity": DEFAULT_HUMIDITY,
-            "default_mode": DEFAULT_MODE,
-            "default_speed": DEFAULT_MANUAL_SPEED,
-            "supported_functions": self._supported_extra_functions,
-            "device_code": self._device_code,
-            "supported_controller": self._supported_controller,
-            "min_speed": self._min_speed,
-            "max_speed": self._max_speed,
-            CURRENT_SPEED: DEFAULT_MANUAL_SPEED,
-            COMMAND_UV: STATE_OFF,
-            COMMAND_NIGHT_MODE: STATE_OFF,
-            COMMAND_LIGHT: STATE_OFF,
-            COMMAND_WARM_MIST: STATE_OFF,
-        }
+        self._model = code_set.model
+
+        # Static metadata lives in the device registry, only live fields are
+        # kept in the state attributes.
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, self._attr_unique_id)},
+            name=self._attr_name,
+            manufacturer=self._manufacturer,
+            model=", ".join(self._supported_models),
+            sw_version=f"code {self._device_code}",
+        )
+        self._attr_extra_state_attributes = {}
+        self._apply_device_state(replace(self._model.default_state, power=False))
 
         self._temp_lock = asyncio.Lock()
+        self._scheduler = get_scheduler(hass)
+        self._publisher = StatePublisher(
+            hass, self._state_snapshot, self.async_write_ha_state
+        )
+        self._intent = None
+        self._intent_task = None
+        self._calibration = None
+        self._tasks = EntityTaskManager(hass, self._attr_name)
+        self._metrics = get_metrics(hass).recorder(
+            self._attr_unique_id, str(self._controller_data)
+        )
         self._controller = get_controller(
             self.hass,
             self._supported_controller,
             self._commands_encoding,
             self._controller_data,
             self._delay,
+            code_set,
+            self._merge_commands,
+            timing,
+            self._metrics,
         )
 
     async def async_added_to_hass(self):
         """Run when entity about to be added."""
         await super().async_added_to_hass()
+        get_metrics(self.hass).register(self._attr_unique_id, self._stats)
+        get_entities(self.hass)[self.entity_id] = self
+
+        sensors = [x for x in (self._humidity_sensor, self._power_sensor) if x]
+        if sensors:
+            self.async_on_remove(
+                async_track_state_change_event(
+                    self.hass, sensors, self._async_sensor_changed
+                )
+            )
+            self.async_on_remove(self._cancel_reconcile)
+            if self._humidity_sensor:
+                self._update_current_humidity(self.hass.states.get(self._humidity_sensor))
+
         last_state = await self.async_get_last_state()
 
-        if not last_state:
+        if not last_state or last_state.state != STATE_ON:
             return
 
-        if last_state is not None:
-            self._state = last_state.state == STATE_ON
-            if last_state.state == STATE_ON:
-                self._attr_mode = last_state.attributes.get("mode")
-                self._attr_target_humidity = last_state.attributes.get("humidity")
-                self.manaual_speed = last_state.attributes.get("current_speed")
-                self.uv = last_state.attributes.get(COMMAND_UV)
-                self.night = last_state.attributes.get(COMMAND_NIGHT_MODE)
-                self.light = last_state.attributes.get(COMMAND_LIGHT)
-                self.warm = last_state.attributes.get(COMMAND_WARM_MIST)
-            else:
-                self._attr_mode = DEFAULT_MODE
-                self._attr_target_humidity = DEFAULT_HUMIDITY
-                self.manaual_speed = DEFAULT_MANUAL_SPEED
-                self.uv = STATE_OFF
-                self.night = STATE_OFF
-                self.light = STATE_OFF
-                self.warm = STATE_OFF
-            self._attr_extra_state_attributes = {
-                "manufacturer": last_state.attributes.get("manufacturer"),
-                "model": last_state.attributes.get("model"),
-                "default_humidity": last_state.attributes.get("default_humidity"),
-                "default_mode": last_state.attributes.get("default_mode"),
-                "default_speed": last_state.attributes.get("default_speed"),
-                "supported_functions": last_state.attributes.get("supported_functions"),
-                "allowed_commands": last_state.attributes.get("allowed_commands"),
-                "device_code": last_state.attributes.get("device_code"),
-                "supported_controller": last_state.attributes.get(
-                    "supported_controller"
+        default = self._model.default_state
+        humidity = last_state.attributes.get(ATTR_HUMIDITY)
+        speed = last_state.attributes.get(CURRENT_SPEED)
+        mode = last_state.attributes.get("mode")
+        self._apply_device_state(
+            DeviceState(
+                power=True,
+                mode=mode if mode in self._attr_available_modes else default.mode,
+                speed=default.speed if speed is None else self._model.snap_speed(speed),
+                humidity=default.humidity
+                if humidity is None
+                else self._model.snap_humidity(humidity),
+                functions=frozenset(
+                    x
+                    for x in self._supported_extra_functions
+                    if last_state.attributes.get(x) == STATE_ON
                 ),
-                "min_speed": last_state.attributes.get("min_speed"),
-                "max_speed": last_state.attributes.get("max_speed"),
-                CURRENT_SPEED: self.manaual_speed,
-                COMMAND_UV: self.uv,
-                COMMAND_NIGHT_MODE: self.night,
-                COMMAND_LIGHT: self.light,
-                COMMAND_WARM_MIST: self.warm,
-            }
+            )
+        )
+
+    async def async_will_remove_from_hass(self):
+        """Run when entity will be removed."""
+        await super().async_will_remove_from_hass()
+        self._cancel_reconcile()
+        if self._intent_task is not None:
+            self._intent_task.cancel()
+        await self._tasks.async_cancel()
+        self._publisher.cancel()
+        get_metrics(self.hass).unregister(self._attr_unique_id)
+        get_entities(self.hass).pop(self.entity_id, None)
+
+    def _stats(self) -> dict:
+        """Return the counters of the entity for the diagnostics."""
+        return {
+            "tasks": self._tasks.stats(),
+            "publisher": self._publisher.stats(),
+        }
+
+    def _state_snapshot(self) -> dict[str, Any]:
+        """Return the published fields of the entity."""
+        return {
+            "state": self.is_on,
+            "mode": self._attr_mode,
+            "humidity": self._attr_target_humidity,
+            "current_humidity": self._attr_current_humidity,
+            **self._attr_extra_state_attributes,
+        }
 
     @property
     def mode(self):
@@ -308,191 +442,461 @@ class IRHumidifier(HumidifierEntity, RestoreEntity, ABC):
     async def async_set_mode(self, mode: str):
         """Set new target preset mode."""
         if self._state is False:
-            await self.async_update_ha_state(True)
             return
-        self._attr_mode = mode
-
-        await self.async_send_command(mode)
-
-        if mode == MODE_BABY:
-            self._attr_extra_state_attributes.update(
-                {COMMAND_WARM_MIST: STATE_ON, COMMAND_UV: STATE_ON}
-            )
-            self._attr_target_humidity = 55
 
-        if mode == MODE_COMFORT:
-            self._attr_target_humidity = 45
-
-        await self.async_update_ha_state()
+        await self._async_reach(TargetState(power=True, mode=mode), PRIORITY_MODE)
 
     async def async_set_humidity(self, humidity: int):
         """Set new target humidity."""
-
-        current_mode = self._attr_mode
         if self._state is False:
-            await self.async_update_ha_state(True)
             return
 
-        commands = []
-        if current_mode != MODE_AUTO:
-            commands.append(MODE_AUTO)
-
-        previous_humidity = self._attr_target_humidity
-        self._attr_target_humidity = humidity
-
-        if previous_humidity > humidity:
-            delta = previous_humidity - humidity
-            send_events = int(delta / 10)
-            commands += [COMMAND_DECREASE] * send_events
-            commands += [COMMAND_DECREASE]
-
-        if previous_humidity < humidity:
-            delta = humidity - previous_humidity
-            send_events = int(delta / 10)
-            commands += [COMMAND_INCREASE] * send_events
-            commands += [COMMAND_INCREASE]
-
-        await self.async_send_commands(commands)
-        await self.async_update_ha_state()
+        await self._async_request_intent(mode=MODE_AUTO, humidity=humidity)
 
     async def async_turn_off(self, **kwargs):
         """Turn the device off."""
-        _LOGGER.warning("Power off has been called")
-        self._state = False
-        await self._reset_state()
-        await self.async_send_command(STATE_OFF)
-        await self.async_update_ha_state()
+        _LOGGER.debug("Power off has been called")
+        self._intent = None
+        await self._async_reach(TargetState(power=False), PRIORITY_POWER)
 
     async def async_turn_on(self, **kwargs):
         """Turn the device on."""
-        _LOGGER.warning("Power on has been called")
-        await self._reset_state()
-        self._state = True
-        await self.async_send_command(STATE_ON)
-        await self.async_update_ha_state()
+        _LOGGER.debug("Power on has been called")
+        await self._async_reach(TargetState(power=True), PRIORITY_POWER)
+
+    async def _async_reach(self, target: TargetState, priority: int = PRIORITY_STEP):
+        """Transmit the shortest press sequence reaching a target state."""
+        await self._async_press(self._model.plan(self._device_state(), target), priority)
+
+    async def _async_press(self, commands, priority: int = PRIORITY_STEP) -> list[str]:
+        """Transmit commands unless they leave the modelled state unchanged.
+
+        Returns the commands that were sent.
+        """
+        current = self._device_state()
+        state = self._model.apply_all(current, commands)
+        if state == current:
+            return []
+
+        sent = await self.async_send_commands(list(commands), priority)
+        if len(sent) < len(commands):
+            # Only model what the unit was actually sent.
+            state = self._model.apply_all(current, sent)
+        self._apply_device_state(state)
+        self._publisher.schedule()
+        if sent and self._power_sensor:
+            if state.power != current.power:
+                # Check that the unit followed once its power draw settles.
+                self._power_sent_at = time.monotonic()
+                self._reconcile_attempts = 0
+                self._schedule_reconcile()
+            else:
+                self._power_sent_at = None
+        return sent
 
-    async def async_send_commands(self, commands: list[str]):
+    @property
+    def blasters(self) -> tuple:
+        """Blasters the entity transmits through."""
+        return tuple(sorted(self._controller_data.targets))
+
+    def plan_target(
+        self,
+        state: str | None = None,
+        mode: str | None = None,
+        humidity: int | None = None,
+        speed: int | None = None,
+        functions: list[str] | None = None,
+    ) -> Plan:
+        """Plan the commands reaching an end state from the modelled state.
+
+        Asking for a mode, humidity, speed or functions implies the unit is
+        on. Like the set_humidity and set_speed services, a humidity picks
+        the auto mode and a speed the normal mode unless a mode is given.
+        """
+        if state == STATE_OFF:
+            target = TargetState(power=False)
+        else:
+            if mode is not None and mode not in self._attr_available_modes:
+                raise Exception(f"{self.entity_id} doesn't support the mode '{mode}'")
+            if functions is not None:
+                unsupported = set(functions) - set(self._supported_extra_functions)
+                if unsupported:
+                    raise Exception(
+                        f"{self.entity_id} doesn't support {', '.join(sorted(unsupported))}"
+                    )
+            if mode is None and humidity is not None:
+                mode = MODE_AUTO
+            elif mode is None and speed is not None:
+                mode = MODE_NORMAL
+            wanted = (state, mode, humidity, speed, functions)
+            target = TargetState(
+                power=True if any(x is not None for x in wanted) else None,
+                mode=mode,
+                speed=None if speed is None else self._model.snap_speed(speed),
+                humidity=None
+                if humidity is None
+                else self._model.snap_humidity(humidity),
+                functions=None if functions is None else frozenset(functions),
+            )
+        start = self._device_state()
+        return Plan(start, target, tuple(self._model.plan(start, target)))
+
+    async def async_execute_plan(self, plan: Plan) -> tuple[tuple, list[str]]:
+        """Transmit a plan, returning the commands planned and those sent.
+
+        The plan is made again when the modelled state has changed since.
+        """
+        self._intent = None
+        commands = plan.commands
+        if self._device_state() != plan.start:
+            commands = tuple(self._model.plan(self._device_state(), plan.target))
+        if not commands:
+            return commands, []
+        return commands, await self._async_press(commands, PRIORITY_MODE)
+
+    async def async_send_commands(
+        self, commands: list[str], priority: int = PRIORITY_STEP
+    ) -> list[str]:
+        """Transmit commands, returning the ones that were actually sent."""
+        started = time.perf_counter()
         async with self._temp_lock:
+            self._metrics.record(METRIC_LOCK_WAIT, time.perf_counter() - started)
             try:
-                for command in commands:
-                    await self._controller.send(self._commands[command])
-                    await asyncio.sleep(self._delay)
+                if commands:
+                    await self._async_transmit(commands, priority)
+            except SendError as e:
+                _LOGGER.error("%s: %s", self.entity_id, e)
+                return e.sent
             except Exception as e:
                 _LOGGER.exception(e)
+                return []
+            return commands
+
+    async def async_send_command(self, command: str, priority: int = PRIORITY_STEP):
+        await self.async_send_commands([command.lower()], priority)
+
+    async def _async_transmit(self, commands, priority, gaps=None):
+        """Transmit commands once the device and the blaster are ready."""
+        self._metrics.record(METRIC_SEQUENCE_LENGTH, len(commands))
+        await self._controller.async_wait_ready(commands[0])
+        async with self._scheduler.slot(self._controller_data.targets, priority):
+            await self._controller.send_sequence(commands, gaps)
+
+    async def async_calibrate_delay(
+        self,
+        first: str,
+        second: str,
+        sensor: str | None = None,
+        min_delay: float = CALIBRATION_MIN_DELAY,
+        max_delay: float | None = None,
+        iterations: int = CALIBRATION_ITERATIONS,
+        settle: float = CALIBRATION_SETTLE,
+        tolerance: float = CALIBRATION_TOLERANCE,
+    ):
+        """Find the smallest gap the device needs between two commands.
+
+        Every trial power cycles the unit into a known state, sends both
+        commands with a candidate gap and judges the outcome. With a sensor
+        the reading must match the one taken at the safe delay, otherwise
+        the user answers through the confirm_calibration service.
+        """
+        if self._state is False:
+            _LOGGER.warning("Calibration needs %s to be on", self.entity_id)
+            return
+
+        start = self._device_state()
+        max_delay = self._delay if max_delay is None else max_delay
+        restore = [COMMAND_OFF] + list(
+            self._model.plan(
+                replace(self._model.default_state, power=False),
+                TargetState(
+                    power=True,
+                    mode=start.mode,
+                    speed=start.speed,
+                    humidity=start.humidity,
+                    functions=start.functions,
+                ),
+            )
+        )
+        reference = []
+
+        async def async_restore():
+            await self._async_transmit(
+                restore, PRIORITY_POWER, [max_delay] * (len(restore) - 1)
+            )
+            await asyncio.sleep(settle)
+
+        async def async_trial(delay: float) -> bool:
+            await async_restore()
+            await self._async_transmit([first, second], PRIORITY_STEP, [delay])
+            await asyncio.sleep(settle)
+
+            if sensor is None:
+                self._calibration = self.hass.loop.create_future()
+                _LOGGER.warning(
+                    "Calibrating %s: did the unit follow %s then %s after %.3f s? "
+                    "Answer with the confirm_calibration service",
+                    self.entity_id,
+                    first,
+                    second,
+                    delay,
+                )
+                try:
+                    return await asyncio.wait_for(
+                        self._calibration, CALIBRATION_CONFIRM_TIMEOUT
+                    )
+                finally:
+                    self._calibration = None
+
+            state = self.hass.states.get(sensor)
+            value = None if state is None else state.state
+            if not reference:
+                reference.append(value)
+                return value not in (None, STATE_UNKNOWN, STATE_UNAVAILABLE)
+            return _readings_match(value, reference[0], tolerance)
 
-    async def async_send_command(self, command: str):
         async with self._temp_lock:
             try:
-                await self._controller.send(self._commands[command.lower()])
-                _LOGGER.warning("sending command: %s", command)
-                await asyncio.sleep(self._delay)
-            except Exception as e:
-                _LOGGER.exception(e)
+                gap = await async_calibrate(
+                    async_trial, min_delay, max_delay, iterations
+                )
+            finally:
+                await async_restore()
+                self._apply_device_state(start)
+
+        if gap is None:
+            _LOGGER.warning(
+                "Calibration of %s failed even with a %.3f s delay",
+                self.entity_id,
+                max_delay,
+            )
+            return
 
-    async def _async_toggle_function(self, function: str) -> None:
-        self.hass.async_create_task(self.async_toggle_function(function))
+        _LOGGER.info(
+            "Calibrated gap between %s and %s of %s: %.3f s",
+            first,
+            second,
+            self.entity_id,
+            gap,
+        )
+        await get_timing_store(self.hass).async_save_gap(
+            self._device_code, first, second, round(gap, 3)
+        )
 
-    async def async_toggle_function(self, function: str) -> None:
-        night_mode_status = self._attr_extra_state_attributes[COMMAND_NIGHT_MODE]
+    async def async_confirm_calibration(self, success: bool):
+        """Answer the question of a running calibration."""
+        if self._calibration is not None and not self._calibration.done():
+            self._calibration.set_result(success)
 
-        if self._state is False:
-            return
+    async def _async_toggle_function(self, function: str) -> None:
+        self._tasks.submit(self.async_toggle_function(function))
 
-        if night_mode_status == STATE_ON and function == COMMAND_LIGHT:
+    async def async_toggle_function(self, function: str) -> None:
+        if function not in self._supported_extra_functions:
             return
 
-        state = self._attr_extra_state_attributes[function]
-
-        if function == COMMAND_NIGHT_MODE:
-            self._attr_extra_state_attributes.update(
-                {function: COMMAND_NIGHT_MODE, COMMAND_LIGHT: STATE_OFF}
-            )
-        else:
-            self._attr_extra_state_attributes.update(
-                {function: STATE_ON if state == STATE_OFF else STATE_ON}
-            )
-        await self.async_send_command(function)
-        await self.async_update_ha_state()
+        await self._async_press([function])
 
     async def _async_increase(self):
-        self.hass.async_create_task(self.async_toggle_function("increase"))
+        self._tasks.submit(self.async_increase())
 
     async def async_increase(self):
-        current_mode = self._attr_mode
-        if current_mode in [MODE_BABY, MODE_COMFORT] or self._state is False:
-            return
-
-        if current_mode == MODE_NORMAL:
-            self._attr_extra_state_attributes[CURRENT_SPEED] += 1
-
-        if current_mode == MODE_AUTO:
-            self._attr_target_humidity += 10
-
-        await self.async_send_command("increase")
-        await self.async_update_ha_state()
+        await self._async_press([COMMAND_INCREASE])
 
     async def _async_decrease(self):
-        self.hass.async_create_task(self.async_toggle_function("decrease"))
+        self._tasks.submit(self.async_decrease())
 
     async def async_decrease(self):
-        current_mode = self._attr_mode
-        if current_mode in [MODE_BABY, MODE_COMFORT] or self._state is False:
+        await self._async_press([COMMAND_DECREASE])
+
+    async def _async_set_speed(self, speed: int):
+        self._tasks.submit(self.async_set_speed(speed), "speed")
+
+    async def async_set_speed(self, speed: int):
+        """Set new target speed."""
+        if self._state is False:
             return
 
-        if current_mode == MODE_NORMAL:
-            self._attr_extra_state_attributes[CURRENT_SPEED] -= 1
+        await self._async_request_intent(mode=MODE_NORMAL, speed=speed)
 
-        if current_mode == MODE_AUTO:
-            self._attr_target_humidity -= 10
+    async def _async_request_intent(self, **intent):
+        """Queue a target state, superseding any target not yet transmitted."""
+        self._intent = intent
+        if self._intent_task is None or self._intent_task.done():
+            self._intent_task = self.hass.async_create_task(
+                self._async_process_intents()
+            )
+        await asyncio.shield(self._intent_task)
+
+    async def _async_process_intents(self):
+        """Transmit the latest queued target once a burst of requests settles."""
+        await asyncio.sleep(INTENT_DEBOUNCE)
+
+        while self._intent:
+            intent, self._intent = self._intent, None
+            if self._state is False:
+                break
+
+            await self._async_reach(self._intent_target(intent))
+
+    def _intent_target(self, intent) -> TargetState:
+        """Return the device state requested by an intent."""
+        humidity = intent.get("humidity")
+        if humidity is not None:
+            humidity = self._model.snap_humidity(humidity)
+        speed = intent.get("speed")
+        if speed is not None:
+            speed = self._model.snap_speed(speed)
+        return TargetState(
+            power=True, mode=intent["mode"], speed=speed, humidity=humidity
+        )
 
-        await self.async_send_command("decrease")
-        await self.async_update_ha_state()
+    def _device_state(self) -> DeviceState:
+        """Return the modelled device state."""
+        return DeviceState(
+            power=self._state in (True, STATE_ON),
+            mode=self._attr_mode,
+            speed=self._attr_extra_state_attributes[CURRENT_SPEED],
+            humidity=self._model.snap_humidity(self._attr_target_humidity),
+            functions=frozenset(
+                x
+                for x in self._supported_extra_functions
+                if self._attr_extra_state_attributes.get(x) == STATE_ON
+            ),
+        )
 
-    async def _async_set_speed(self, speed: int):
-        self.hass.async_create_task(self.async_set_speed(int))
+    def _apply_device_state(self, state: DeviceState):
+        """Store a modelled device state in the entity attributes."""
+        self._state = state.power
+        self._attr_mode = state.mode
+        self._attr_target_humidity = state.humidity
+        self._attr_extra_state_attributes[CURRENT_SPEED] = state.speed
+        self._attr_extra_state_attributes.update(
+            {
+                x: STATE_ON if x in state.functions else STATE_OFF
+                for x in self._supported_extra_functions
+            }
+        )
 
-    async def async_set_speed(self, speed: int):
-        """Set new target humidity."""
+    async def async_sync_state(self, state: str):
+        self._tasks.submit(self._async_sync_state(state), "sync_state")
 
-        current_mode = self._attr_mode
-        if self._state is False:
-            await self.async_update_ha_state(True)
+    async def _async_sync_state(self, state: str):
+        self._state = state == STATE_ON
+        self._publisher.schedule()
+
+    @callback
+    def _async_sensor_changed(self, event):
+        """Handle a state change of a linked sensor."""
+        if event.data["entity_id"] == self._humidity_sensor:
+            self._update_current_humidity(event.data.get("new_state"))
+            self._publisher.schedule()
             return
 
-        commands = []
-        if current_mode != MODE_NORMAL:
-            commands.append(MODE_NORMAL)
+        # Power readings are noisy around transitions, so only judge them
+        # once the sensor has settled.
+        self._schedule_reconcile()
 
-        previous_speed = self._attr_extra_state_attributes[CURRENT_SPEED]
-        self._attr_extra_state_attributes[CURRENT_SPEED] = speed
+    @callback
+    def _update_current_humidity(self, state):
+        try:
+            self._attr_current_humidity = int(float(state.state))
+        except (AttributeError, TypeError, ValueError):
+            self._attr_current_humidity = None
+
+    @callback
+    def _schedule_reconcile(self):
+        self._cancel_reconcile()
+        self._reconcile_unsub = async_call_later(
+            self.hass, RECONCILE_SETTLE, self._async_reconcile_later
+        )
 
-        if previous_speed > speed:
-            delta = previous_speed - speed
-            commands += [COMMAND_DECREASE] * delta
+    @callback
+    def _cancel_reconcile(self):
+        if self._reconcile_unsub is not None:
+            self._reconcile_unsub()
+            self._reconcile_unsub = None
 
-        if previous_speed < speed:
-            delta = speed - previous_speed
-            commands += [COMMAND_INCREASE] * delta
+    @callback
+    def _async_reconcile_later(self, _now):
+        self._reconcile_unsub = None
+        self._tasks.submit(self.async_reconcile(), "reconcile")
 
-        await self.async_send_commands(commands)
-        await self.async_update_ha_state()
+    def _observed_power(self) -> bool | None:
+        """Return whether the power sensor shows the unit running."""
+        state = self.hass.states.get(self._power_sensor)
+        try:
+            return float(state.state) > self._power_threshold
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    async def async_reconcile(self):
+        """Correct divergence between the modelled and the observed power.
+
+        Runs once the power draw settles after every transmission changing
+        the power, and after every change of the power sensor. When the
+        last transmission changed the power and the unit doesn't show it,
+        the unit missed the burst and the minimal commands to the modelled
+        state are sent again, then checked again. Otherwise the unit was
+        operated by other means, such as its own remote, and the model
+        adopts the observed state.
+        """
+        observed = self._observed_power()
+        if observed is None:
+            return
 
-    async def async_sync_state(self, state: str):
-        self.hass.async_create_task(self._async_sync_state(state))
+        current = self._device_state()
+        if observed == current.power:
+            self._reconcile_attempts = 0
+            return
 
-    async def _async_sync_state(self, state: str):
-        self._state = state
-        await self.async_update_ha_state()
+        if self._temp_lock.locked():
+            self._schedule_reconcile()
+            return
 
-    async def _reset_state(self):
-        self._attr_target_humidity = DEFAULT_HUMIDITY
-        self._attr_extra_state_attributes.update(
-            {
-                CURRENT_SPEED: DEFAULT_MANUAL_SPEED,
-                COMMAND_UV: STATE_OFF,
-                COMMAND_NIGHT_MODE: STATE_OFF,
-                COMMAND_LIGHT: STATE_OFF,
-                COMMAND_WARM_MIST: STATE_OFF,
-            }
+        actual = replace(self._model.default_state, power=observed)
+        missed = (
+            self._power_sent_at is not None
+            and time.monotonic() - self._power_sent_at < RECONCILE_GRACE
+        )
+        if missed and self._reconcile_attempts < RECONCILE_RETRIES:
+            self._reconcile_attempts += 1
+            target = TargetState(power=False)
+            if current.power:
+                target = TargetState(
+                    power=True,
+                    mode=current.mode,
+                    speed=current.speed,
+                    humidity=current.humidity,
+                    functions=current.functions,
+                )
+            commands = list(self._model.plan(actual, target))
+            _LOGGER.info(
+                "%s missed a command, sending %s again", self.entity_id, commands
+            )
+            if await self.async_send_commands(commands, PRIORITY_POWER):
+                self._power_sent_at = time.monotonic()
+            self._schedule_reconcile()
+            return
+
+        _LOGGER.info(
+            "%s was turned %s outside of Home Assistant",
+            self.entity_id,
+            STATE_ON if observed else STATE_OFF,
         )
-        self._attr_mode = DEFAULT_MODE
+        self._reconcile_attempts = 0
+        self._power_sent_at = None
+        self._intent = None
+        self._apply_device_state(actual)
+        self._publisher.schedule()
+
+
+def _readings_match(value, reference, tolerance: float) -> bool:
+    """Return whether a sensor reading matches the reference reading."""
+    if value in (None, STATE_UNKNOWN, STATE_UNAVAILABLE):
+        return False
+    try:
+        value, reference = float(value), float(reference)
+    except (TypeError, ValueError):
+        return value == reference
+    return abs(value - reference) <= tolerance * max(abs(reference), 1.0)
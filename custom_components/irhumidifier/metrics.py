@@ -0,0 +1,134 @@
+"""Rolling histograms of the transmission hot path."""
+from __future__ import annotations
+
+from collections import deque
+from contextlib import contextmanager
+import time
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, METRICS_WINDOW
+
+DATA_METRICS = "metrics"
+
+METRIC_ENCODE = "encode"
+METRIC_LOCK_WAIT = "lock_wait"
+METRIC_SERVICE_CALL = "service_call"
+METRIC_SLEEP = "sleep"
+METRIC_SEQUENCE_LENGTH = "sequence_length"
+
+
+class RollingHistogram:
+    """The most recent samples of a measurement."""
+
+    __slots__ = ("_samples", "count")
+
+    def __init__(self, size: int = METRICS_WINDOW):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+
+    def record(self, value: float) -> None:
+        """Add a sample, evicting the oldest one once the window is full."""
+        self._samples.append(value)
+        self.count += 1
+
+    def summary(self) -> dict:
+        """Return the percentiles of the samples in the window."""
+        samples = sorted(self._samples)
+        if not samples:
+            return {"count": self.count}
+
+        last = len(samples) - 1
+        return {
+            "count": self.count,
+            "mean": sum(samples) / len(samples),
+            "p50": samples[last * 50 // 100],
+            "p90": samples[last * 90 // 100],
+            "p99": samples[last * 99 // 100],
+            "max": samples[last],
+        }
+
+
+class MetricSet:
+    """Named histograms of one entity or one blaster."""
+
+    def __init__(self):
+        self._histograms: dict[str, RollingHistogram] = {}
+
+    def record(self, name: str, value: float) -> None:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = RollingHistogram()
+        histogram.record(value)
+
+    def summary(self) -> dict:
+        return {name: h.summary() for name, h in self._histograms.items()}
+
+
+class Recorder:
+    """Record the measurements of an entity into its set and its blaster's."""
+
+    __slots__ = ("_sets",)
+
+    def __init__(self, *sets: MetricSet):
+        self._sets = sets
+
+    def record(self, name: str, value: float) -> None:
+        for metric_set in self._sets:
+            metric_set.record(name, value)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record the duration of the block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+
+class Metrics:
+    """Metrics of every entity and blaster of the integration."""
+
+    def __init__(self):
+        self.entities: dict[str, MetricSet] = {}
+        self.blasters: dict[str, MetricSet] = {}
+        self.sources: dict[str, object] = {}
+
+    def register(self, entity: str, source) -> None:
+        """Add the counters returned by source to the summary of an entity."""
+        self.sources[entity] = source
+
+    def unregister(self, entity: str) -> None:
+        self.sources.pop(entity, None)
+
+    def recorder(self, entity: str, blaster: str) -> Recorder:
+        """Return a recorder feeding the sets of an entity and its blaster."""
+        return Recorder(
+            self.entities.setdefault(entity, MetricSet()),
+            self.blasters.setdefault(blaster, MetricSet()),
+        )
+
+    def entity_summary(self, entity: str) -> dict:
+        """Return the histograms and counters of one entity."""
+        metric_set = self.entities.get(entity)
+        summary = {} if metric_set is None else metric_set.summary()
+        source = self.sources.get(entity)
+        if source is not None:
+            summary.update(source())
+        return summary
+
+    def summary(self) -> dict:
+        return {
+            "entities": {k: self.entity_summary(k) for k in self.entities},
+            "blasters": {k: v.summary() for k, v in self.blasters.items()},
+        }
+
+
+def get_metrics(hass: HomeAssistant) -> Metrics:
+    """Return the metrics shared by every entity of the integration."""
+    data = hass.data.setdefault(DOMAIN, {})
+    metrics = data.get(DATA_METRICS)
+    if metrics is None:
+        metrics = data[DATA_METRICS] = Metrics()
+    return metrics
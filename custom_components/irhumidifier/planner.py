@@ -0,0 +1,453 @@
+"""Plan the shortest sequence of presses between two device states."""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Optional
+
+from .const import (
+    COMMAND_DECREASE,
+    COMMAND_INCREASE,
+    COMMAND_LIGHT,
+    COMMAND_NIGHT_MODE,
+    COMMAND_UV,
+    COMMAND_WARM_MIST,
+    DEFAULT_HUMIDITY,
+    DEFAULT_MANUAL_SPEED,
+    HUMIDIFIER_FUNCTIONS,
+)
+
+COMMAND_ON = "on"
+COMMAND_OFF = "off"
+
+MODE_AUTO = "auto"
+MODE_NORMAL = "normal"
+
+TYPE_TOGGLE = "toggle"
+TYPE_SETTER = "setter"
+TYPE_STEPPER = "stepper"
+
+STATE_POWER = "power"
+STATE_MODE = "mode"
+STATE_SPEED = "speed"
+STATE_HUMIDITY = "humidity"
+
+# Side effects of selecting a preset mode when the code file declares none.
+DEFAULT_MODE_EFFECTS = {
+    "baby": {STATE_HUMIDITY: 55, COMMAND_WARM_MIST: "on", COMMAND_UV: "on"},
+    "comfort": {STATE_HUMIDITY: 45},
+}
+
+PLAN_CACHE_SIZE = 1024
+
+
+class CommandType:
+    """Declared effect of a command on the modelled device state.
+
+    ``state`` names the state the command acts on: ``power``, ``mode``,
+    ``speed``, ``humidity`` or an extra function. A stepper may map modes
+    to the state it steps in that mode. ``effects`` are applied when a
+    setter is selected or a toggle switches on, and ``requires`` lists
+    states that must hold for the command to have any effect.
+    """
+
+    __slots__ = ("kind", "state", "value", "step", "effects", "requires")
+
+    def __init__(self, kind, state, value=None, step=1, effects=None, requires=None):
+        if kind not in (TYPE_TOGGLE, TYPE_SETTER, TYPE_STEPPER):
+            raise ValueError(f"Unknown command type '{kind}'")
+        if kind == TYPE_SETTER and value is None:
+            raise ValueError("A setter command needs a value")
+        self.kind = kind
+        self.state = state
+        self.value = value
+        self.step = step
+        self.effects = dict(effects or {})
+        self.requires = dict(requires or {})
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a command type from its code file declaration."""
+        return cls(
+            data["type"],
+            data["state"],
+            value=data.get("value"),
+            step=int(data.get("step", 1)),
+            effects=data.get("effects"),
+            requires=data.get("requires"),
+        )
+
+
+def default_command_types(modes, functions):
+    """Return the command types of code files that declare none."""
+    types = {
+        COMMAND_ON: CommandType(TYPE_SETTER, STATE_POWER, "on"),
+        COMMAND_OFF: CommandType(TYPE_SETTER, STATE_POWER, "off"),
+        COMMAND_INCREASE: CommandType(
+            TYPE_STEPPER, {MODE_AUTO: STATE_HUMIDITY, MODE_NORMAL: STATE_SPEED}, step=1
+        ),
+        COMMAND_DECREASE: CommandType(
+            TYPE_STEPPER, {MODE_AUTO: STATE_HUMIDITY, MODE_NORMAL: STATE_SPEED}, step=-1
+        ),
+    }
+    for mode in modes:
+        types[mode] = CommandType(
+            TYPE_SETTER, STATE_MODE, mode, effects=DEFAULT_MODE_EFFECTS.get(mode)
+        )
+    for function in functions:
+        types[function] = CommandType(TYPE_TOGGLE, function)
+    if COMMAND_NIGHT_MODE in functions:
+        types[COMMAND_NIGHT_MODE].effects[COMMAND_LIGHT] = "off"
+        if COMMAND_LIGHT in functions:
+            types[COMMAND_LIGHT].requires[COMMAND_NIGHT_MODE] = "off"
+    return types
+
+
+@dataclass(frozen=True)
+class DeviceState:
+    """State of a device as modelled from the commands sent to it."""
+
+    power: bool
+    mode: str
+    speed: int
+    humidity: int
+    functions: frozenset = frozenset()
+
+
+@dataclass(frozen=True)
+class TargetState:
+    """Desired device state, fields left to None are not cared about."""
+
+    power: Optional[bool] = None
+    mode: Optional[str] = None
+    speed: Optional[int] = None
+    humidity: Optional[int] = None
+    functions: Optional[frozenset] = None
+
+    def matches(self, state: DeviceState) -> bool:
+        """Return whether a state satisfies the target."""
+        return (
+            (self.power is None or self.power == state.power)
+            and (self.mode is None or self.mode == state.mode)
+            and (self.speed is None or self.speed == state.speed)
+            and (self.humidity is None or self.humidity == state.humidity)
+            and (self.functions is None or self.functions == state.functions)
+        )
+
+
+@dataclass(frozen=True)
+class Plan:
+    """Commands planned to bring a device from a state to a target."""
+
+    start: DeviceState
+    target: TargetState
+    commands: tuple
+
+
+class DeviceModel:
+    """Setpoint lattice and command semantics of a device code set."""
+
+    def __init__(
+        self,
+        modes,
+        functions,
+        min_humidity,
+        max_humidity,
+        humidity_step,
+        min_speed,
+        max_speed,
+        humidity_wrap=False,
+        speed_wrap=False,
+        power_cycle=False,
+        default_mode=MODE_NORMAL,
+        default_humidity=DEFAULT_HUMIDITY,
+        default_speed=DEFAULT_MANUAL_SPEED,
+        command_types=None,
+    ):
+        self.modes = tuple(modes)
+        self.functions = tuple(functions)
+        self.min_humidity = min_humidity
+        self.max_humidity = max_humidity
+        self.humidity_step = humidity_step
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.humidity_wrap = humidity_wrap
+        self.speed_wrap = speed_wrap
+        self.power_cycle = power_cycle
+        self.command_types = (
+            default_command_types(self.modes, self.functions)
+            if command_types is None
+            else command_types
+        )
+        self._validate()
+        self.core_commands = tuple(
+            command
+            for command, kind in self.command_types.items()
+            if kind.state not in (STATE_POWER,) + self.functions
+        )
+        self.toggle_commands = tuple(
+            command
+            for command, kind in self.command_types.items()
+            if kind.state in self.functions
+        )
+        self.default_state = DeviceState(
+            power=True,
+            mode=default_mode,
+            speed=default_speed,
+            humidity=self.snap_humidity(default_humidity),
+        )
+        self.plan = lru_cache(maxsize=PLAN_CACHE_SIZE)(self._plan)
+        self._toggle_plan = lru_cache(maxsize=PLAN_CACHE_SIZE)(self._toggle_plan)
+
+    @classmethod
+    def from_device_data(cls, device_data):
+        """Build the model declared by a device Json file."""
+        return cls(
+            modes=device_data["operationModes"],
+            functions=[
+                x for x in device_data["extraFunctions"] if x in HUMIDIFIER_FUNCTIONS
+            ],
+            min_humidity=int(device_data["minHumidity"]),
+            max_humidity=int(device_data["maxHumidity"]),
+            humidity_step=int(device_data.get("humiditySetPrecision", 10)),
+            min_speed=int(device_data["minManualSpeed"]),
+            max_speed=int(device_data["maxManualSpeed"]),
+            humidity_wrap=bool(device_data.get("humidityWrap", False)),
+            speed_wrap=bool(device_data.get("speedWrap", False)),
+            power_cycle=bool(device_data.get("powerCyclePlans", False)),
+            command_types={
+                command: CommandType.from_dict(declaration)
+                for command, declaration in device_data["commandTypes"].items()
+            }
+            if "commandTypes" in device_data
+            else None,
+            default_humidity=int(device_data.get("defaultHumidity", DEFAULT_HUMIDITY)),
+            default_speed=int(
+                device_data.get("defaultManualSpeed", DEFAULT_MANUAL_SPEED)
+            ),
+        )
+
+    def snap_humidity(self, humidity: int) -> int:
+        """Return the reachable setpoint closest to a humidity."""
+        humidity = min(max(humidity, self.min_humidity), self.max_humidity)
+        steps = round((humidity - self.min_humidity) / self.humidity_step)
+        snapped = self.min_humidity + steps * self.humidity_step
+        if snapped > self.max_humidity:
+            snapped -= self.humidity_step
+        return snapped
+
+    def snap_speed(self, speed: int) -> int:
+        """Return the reachable speed closest to a speed."""
+        return min(max(speed, self.min_speed), self.max_speed)
+
+    def _validate(self):
+        """Check that declared command types fit the planner.
+
+        Planning presses function toggles last, which is only optimal when
+        toggles and the other commands do not condition on each other.
+        """
+        for command, kind in self.command_types.items():
+            if kind.state in self.functions:
+                if any(x not in self.functions for x in kind.effects) or any(
+                    x not in self.functions for x in kind.requires
+                ):
+                    raise ValueError(
+                        f"Function command '{command}' may only involve functions"
+                    )
+            elif any(x in self.functions for x in kind.requires):
+                raise ValueError(
+                    f"Command '{command}' may not require a function state"
+                )
+        for command in (COMMAND_ON, COMMAND_OFF):
+            kind = self.command_types.get(command)
+            if kind is None or kind.state != STATE_POWER:
+                raise ValueError(f"The '{command}' command must act on power")
+
+    def _step(self, value, delta, low, high, step, wrap):
+        value += delta * step
+        if value > high:
+            return low if wrap else high
+        if value < low:
+            return high if wrap else low
+        return value
+
+    def _get(self, state: DeviceState, name: str):
+        if name == STATE_POWER:
+            return "on" if state.power else "off"
+        if name in (STATE_MODE, STATE_SPEED, STATE_HUMIDITY):
+            return getattr(state, name)
+        return "on" if name in state.functions else "off"
+
+    def _set(self, state: DeviceState, name: str, value) -> DeviceState:
+        if name == STATE_MODE:
+            return replace(state, mode=value)
+        if name == STATE_SPEED:
+            return replace(state, speed=self.snap_speed(int(value)))
+        if name == STATE_HUMIDITY:
+            return replace(state, humidity=self.snap_humidity(int(value)))
+        if name not in self.functions:
+            return state
+        if value == "on":
+            return replace(state, functions=state.functions | {name})
+        return replace(state, functions=state.functions - {name})
+
+    def apply(self, state: DeviceState, command: str) -> DeviceState:
+        """Return the state of the device after it receives a command."""
+        kind = self.command_types.get(command)
+        if kind is None:
+            return state
+
+        if kind.state == STATE_POWER:
+            if kind.kind == TYPE_TOGGLE:
+                power = not state.power
+            else:
+                power = kind.value == "on"
+            if power == state.power:
+                return state
+            # Powering the device either way resets it to its defaults.
+            return replace(self.default_state, power=power)
+
+        if not state.power:
+            return state
+        if any(self._get(state, x) != value for x, value in kind.requires.items()):
+            return state
+
+        if kind.kind == TYPE_STEPPER:
+            name = kind.state
+            if isinstance(name, dict):
+                name = name.get(state.mode)
+            if name == STATE_HUMIDITY:
+                return replace(
+                    state,
+                    humidity=self._step(
+                        state.humidity,
+                        kind.step,
+                        self.min_humidity,
+                        self.max_humidity,
+                        self.humidity_step,
+                        self.humidity_wrap,
+                    ),
+                )
+            if name == STATE_SPEED:
+                return replace(
+                    state,
+                    speed=self._step(
+                        state.speed,
+                        kind.step,
+                        self.min_speed,
+                        self.max_speed,
+                        1,
+                        self.speed_wrap,
+                    ),
+                )
+            return state
+
+        if kind.kind == TYPE_TOGGLE:
+            value = "off" if self._get(state, kind.state) == "on" else "on"
+        else:
+            value = kind.value
+        state = self._set(state, kind.state, value)
+
+        if value != "off":
+            for name, effect in kind.effects.items():
+                state = self._set(state, name, effect)
+        return state
+
+    def apply_all(self, state: DeviceState, commands) -> DeviceState:
+        """Return the state of the device after a sequence of commands."""
+        for command in commands:
+            state = self.apply(state, command)
+        return state
+
+    def _plan(self, current: DeviceState, target: TargetState) -> tuple:
+        """Return the shortest tuple of commands reaching the target."""
+        if target.power is False:
+            return (COMMAND_OFF,) if current.power else ()
+        if target.matches(current):
+            return ()
+
+        candidates = []
+        if current.power:
+            candidates.append(self._plan_powered(current, target))
+            # Power cycling resets every setting, which can beat stepping back.
+            if self.power_cycle:
+                commands = self._plan_powered(self.default_state, target)
+                if commands is not None:
+                    candidates.append((COMMAND_OFF, COMMAND_ON) + commands)
+        else:
+            commands = self._plan_powered(self.default_state, target)
+            if commands is not None:
+                candidates.append((COMMAND_ON,) + commands)
+
+        candidates = [x for x in candidates if x is not None]
+        if not candidates:
+            raise ValueError(f"The target state {target} is not reachable")
+        return min(candidates, key=len)
+
+    def _plan_powered(self, start: DeviceState, target: TargetState) -> tuple:
+        """Plan with the device on, pressing toggles after everything else.
+
+        Toggles never affect mode, speed or humidity, and preset modes can
+        overwrite them, so deferring them to the end is never worse. That
+        leaves a search over the small mode/speed/humidity lattice.
+        """
+        parents = {start: None}
+        depths = {start: 0}
+        queue = deque([start])
+        best = None
+
+        while queue:
+            state = queue.popleft()
+            if best is not None and depths[state] >= best[0]:
+                break
+            if (
+                (target.mode is None or target.mode == state.mode)
+                and (target.speed is None or target.speed == state.speed)
+                and (target.humidity is None or target.humidity == state.humidity)
+            ):
+                toggles = self._toggle_plan(state, target.functions)
+                if toggles is not None:
+                    cost = depths[state] + len(toggles)
+                    if best is None or cost < best[0]:
+                        best = (cost, state, toggles)
+
+            for command in self.core_commands:
+                following = self.apply(state, command)
+                if following not in parents:
+                    parents[following] = (state, command)
+                    depths[following] = depths[state] + 1
+                    queue.append(following)
+
+        if best is None:
+            return None
+
+        _, state, toggles = best
+        commands = []
+        while parents[state] is not None:
+            state, command = parents[state]
+            commands.append(command)
+        return tuple(reversed(commands)) + toggles
+
+    def _toggle_plan(self, state: DeviceState, target: frozenset | None):
+        """Return the shortest function presses reaching a function set."""
+        if target is None or state.functions == target:
+            return ()
+
+        parents = {state: None}
+        queue = deque([state])
+        while queue:
+            current = queue.popleft()
+            for command in self.toggle_commands:
+                following = self.apply(current, command)
+                if following in parents:
+                    continue
+                parents[following] = (current, command)
+                if following.functions == target:
+                    commands = []
+                    while parents[following] is not None:
+                        following, command = parents[following]
+                        commands.append(command)
+                    return tuple(reversed(commands))
+                queue.append(following)
+        return None
@@ -0,0 +1,64 @@
+"""Coalesce entity state writes and skip the ones that change nothing."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StatePublisher:
+    """Write an entity state at most once per event loop iteration."""
+
+    def __init__(self, hass: HomeAssistant, snapshot, write):
+        self.hass = hass
+        self._snapshot = snapshot
+        self._write = write
+        self._handle = None
+        self._published = None
+        self.writes = 0
+        self.coalesced = 0
+        self.skipped = 0
+
+    @callback
+    def schedule(self) -> None:
+        """Request a state write once the current mutations are done."""
+        if self._handle is not None:
+            self.coalesced += 1
+            return
+        self._handle = self.hass.loop.call_soon(self._flush)
+
+    @callback
+    def cancel(self) -> None:
+        """Drop a pending state write."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    @callback
+    def _flush(self) -> None:
+        self._handle = None
+        snapshot = self._snapshot()
+        if self._published is not None:
+            changed = [
+                key
+                for key, value in snapshot.items()
+                if key not in self._published or self._published[key] != value
+            ]
+            if not changed:
+                self.skipped += 1
+                return
+            _LOGGER.debug("Publishing changed attributes: %s", changed)
+
+        self._published = snapshot
+        self.writes += 1
+        self._write()
+
+    def stats(self) -> dict:
+        """Return write, coalesce and skip counters."""
+        return {
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "skipped": self.skipped,
+        }
@@ -0,0 +1,258 @@
+"""Load device code sets once and share them between entities."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import json
+import logging
+import os.path
+from types import MappingProxyType
+
+from homeassistant.core import HomeAssistant
+
+from . import COMPONENT_ABS_DIR
+from .codepack import PACK_FILE, CodePack
+from .const import CODES_SOURCE, DOMAIN
+from .planner import DeviceModel
+
+_LOGGER = logging.getLogger(__name__)
+
+CODE_SET_CACHE_SIZE = 16
+DERIVED_PAYLOAD_CACHE_SIZE = 64
+
+DATA_REGISTRY = "registry"
+
+
+class CommandTable:
+    """Command payloads of a code set packed into one immutable buffer."""
+
+    __slots__ = ("buffer", "_views", "_encoded", "_derived")
+
+    def __init__(self, packets: dict[str, bytes]):
+        self.buffer = b"".join(packets.values())
+        view = memoryview(self.buffer)
+        self._views = {}
+        offset = 0
+        for name, packet in packets.items():
+            self._views[name] = view[offset : offset + len(packet)]
+            offset += len(packet)
+        self._encoded = {}
+        self._derived = OrderedDict()
+
+    def __contains__(self, name) -> bool:
+        return name in self._views
+
+    def __iter__(self):
+        return iter(self._views)
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def packet(self, name: str) -> memoryview:
+        """Return a zero-copy view of the payload of a command."""
+        try:
+            return self._views[name]
+        except KeyError:
+            raise Exception(f"The command '{name}' is not defined.")
+
+    def encoded(self, name: str, encode) -> str:
+        """Return the payload of a command converted by encode, converting it once."""
+        key = (name, encode)
+        text = self._encoded.get(key)
+        if text is None:
+            text = self._encoded[key] = encode(self.packet(name))
+        return text
+
+    def derived(self, key, build):
+        """Return a payload built from several commands, keeping recent ones."""
+        payload = self._derived.get(key)
+        if payload is None:
+            payload = self._derived[key] = build()
+            if len(self._derived) > DERIVED_PAYLOAD_CACHE_SIZE:
+                self._derived.popitem(last=False)
+        else:
+            self._derived.move_to_end(key)
+        return payload
+
+
+class CodeSet:
+    """Parsed, read-only device code set."""
+
+    def __init__(self, device_code: int, data: dict, mtime: float):
+        self.device_code = device_code
+        self.mtime = mtime
+        self.data = MappingProxyType(data)
+        self.commands = MappingProxyType(data["commands"])
+        self.model = DeviceModel.from_device_data(data)
+        self._compiled = {}
+
+    def compiled(self, key, compile_commands) -> CommandTable:
+        """Return the commands compiled for a controller, compiling them once."""
+        table = self._compiled.get(key)
+        if table is None:
+            table = self._compiled[key] = CommandTable(compile_commands(self.commands))
+        return table
+
+
+class CodeSetRegistry:
+    """LRU cache of code sets keyed by device code and file mtime."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        codes_dir: str,
+        size=CODE_SET_CACHE_SIZE,
+        source: str = CODES_SOURCE,
+    ):
+        self.hass = hass
+        self.codes_dir = codes_dir
+        self._source = source
+        self._sync = None
+        self._size = size
+        self._code_sets: OrderedDict[int, CodeSet] = OrderedDict()
+        self._loading: dict[int, asyncio.Future] = {}
+        self._pack: CodePack | None = None
+
+    @property
+    def sync(self):
+        """Return the downloader of code files, loading it on first use."""
+        if self._sync is None:
+            from .sync import CodeSetSync
+
+            self._sync = CodeSetSync(self.hass, self.codes_dir, self._source)
+        return self._sync
+
+    def cached(self) -> list[dict]:
+        """Return the device codes held in the cache, least recently used first."""
+        return [
+            {
+                "device_code": code_set.device_code,
+                "mtime": code_set.mtime,
+                "tables": len(code_set._compiled),
+            }
+            for code_set in self._code_sets.values()
+        ]
+
+    def path(self, device_code: int) -> str:
+        """Return the path of the Json file of a device code."""
+        return os.path.join(self.codes_dir, f"{device_code}.json")
+
+    async def async_get(self, device_code: int) -> CodeSet:
+        """Return the code set of a device code, loading it when needed."""
+        loading = self._loading.get(device_code)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        future = self._loading[device_code] = self.hass.loop.create_future()
+        try:
+            code_set = await self._async_load(device_code)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else waits on it.
+            future.exception()
+            raise
+        else:
+            future.set_result(code_set)
+            return code_set
+        finally:
+            del self._loading[device_code]
+
+    async def _async_load(self, device_code: int) -> CodeSet:
+        path = self.path(device_code)
+        pack_path = os.path.join(self.codes_dir, PACK_FILE)
+        # Both files are checked in one executor job, setting up many
+        # entities costs one round trip each.
+        mtime, pack_mtime = await self.hass.async_add_executor_job(
+            self._mtimes, path, pack_path
+        )
+
+        # A code file edited after the pack was built takes precedence.
+        pack = await self._async_pack(pack_path, pack_mtime)
+        if pack is not None and device_code in pack and (
+            mtime is None or mtime <= pack.mtime
+        ):
+            return self._cache(
+                device_code, pack.mtime, lambda: pack.device_data(device_code)
+            )
+
+        if mtime is None:
+            _LOGGER.warning(
+                "Couldn't find the device Json file. The component will "
+                "try to download it from the GitHub repo"
+            )
+            try:
+                await self.sync.async_ensure([device_code])
+            except Exception as e:
+                raise Exception(
+                    "There was an error while downloading the device Json file. "
+                    "Please check your internet connection or if the device code "
+                    "exists on GitHub. If the problem still exists please "
+                    f"place the file manually in the proper directory. ({e})"
+                )
+            mtime = await self.hass.async_add_executor_job(self._mtime, path)
+
+        code_set = self._code_sets.get(device_code)
+        if code_set is not None and code_set.mtime == mtime:
+            self._code_sets.move_to_end(device_code)
+            return code_set
+
+        try:
+            data = await self.hass.async_add_executor_job(self._read, path)
+        except Exception as e:
+            raise Exception(f"The device Json file {path} is invalid: {e}")
+
+        _LOGGER.info("Device json file has been loaded from: %s", path)
+        return self._cache(device_code, mtime, lambda: data)
+
+    def _cache(self, device_code: int, mtime: float, load) -> CodeSet:
+        """Return the cached code set of a version, creating it from load()."""
+        code_set = self._code_sets.get(device_code)
+        if code_set is None or code_set.mtime != mtime:
+            try:
+                code_set = CodeSet(device_code, load(), mtime)
+            except Exception as e:
+                raise Exception(f"The code set {device_code} is invalid: {e}")
+            self._code_sets[device_code] = code_set
+        self._code_sets.move_to_end(device_code)
+        while len(self._code_sets) > self._size:
+            self._code_sets.popitem(last=False)
+        return code_set
+
+    async def _async_pack(self, path: str, mtime: float | None) -> CodePack | None:
+        """Return the pack of the codes directory, remapping it when rebuilt."""
+        if mtime is None:
+            self._pack = None
+        elif self._pack is None or self._pack.mtime != mtime:
+            try:
+                self._pack = await self.hass.async_add_executor_job(CodePack.open, path)
+            except (OSError, ValueError) as e:
+                _LOGGER.warning("Ignoring the invalid code pack %s: %s", path, e)
+                self._pack = None
+        return self._pack
+
+    @classmethod
+    def _mtimes(cls, *paths: str) -> list[float | None]:
+        return [cls._mtime(path) for path in paths]
+
+    @staticmethod
+    def _mtime(path: str) -> float | None:
+        try:
+            return os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _read(path: str) -> dict:
+        with open(path) as j:
+            return json.load(j)
+
+
+def get_registry(hass: HomeAssistant, source: str = CODES_SOURCE) -> CodeSetRegistry:
+    """Return the code set registry shared by every entity of the integration."""
+    data = hass.data.setdefault(DOMAIN, {})
+    registry = data.get(DATA_REGISTRY)
+    if registry is None:
+        registry = data[DATA_REGISTRY] = CodeSetRegistry(
+            hass, os.path.join(COMPONENT_ABS_DIR, "codes"), source=source
+        )
+    return registry
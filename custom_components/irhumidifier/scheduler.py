@@ -0,0 +1,126 @@
+"""Serialize IR transmissions per physical blaster."""
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+import heapq
+import itertools
+import time
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+PRIORITY_POWER = 0
+PRIORITY_MODE = 10
+PRIORITY_STEP = 20
+
+DATA_SCHEDULER = "scheduler"
+
+
+class BlasterLane:
+    """Priority queue granting exclusive use of one blaster."""
+
+    def __init__(self):
+        self._busy = False
+        self._waiters = []
+        self._counter = itertools.count()
+        self.transmissions = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of transmissions waiting for the blaster."""
+        return sum(1 for *_, waiter in self._waiters if not waiter.done())
+
+    async def acquire(self, priority: int) -> None:
+        """Wait until the blaster is granted to the caller."""
+        started = time.monotonic()
+
+        if not self._busy and not self._waiters:
+            self._busy = True
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._counter), waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The blaster was handed over right before the cancel.
+                    self.release()
+                raise
+
+        wait = time.monotonic() - started
+        self.transmissions += 1
+        self.last_wait = wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_wait += wait
+
+    def release(self) -> None:
+        """Hand the blaster over to the most urgent waiter."""
+        while self._waiters:
+            *_, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._busy = False
+
+    def stats(self) -> dict:
+        """Return queue depth and wait time statistics."""
+        return {
+            "busy": self._busy,
+            "queue_depth": self.queue_depth,
+            "transmissions": self.transmissions,
+            "last_wait": self.last_wait,
+            "max_wait": self.max_wait,
+            "average_wait": self.total_wait / self.transmissions
+            if self.transmissions
+            else 0.0,
+        }
+
+
+class TransmitScheduler:
+    """Process-wide scheduler of transmissions keyed by blaster entity ID."""
+
+    def __init__(self):
+        self._lanes: dict[str, BlasterLane] = {}
+
+    def lane(self, blaster: str) -> BlasterLane:
+        """Return the lane of a blaster, creating it on first use."""
+        lane = self._lanes.get(blaster)
+        if lane is None:
+            lane = self._lanes[blaster] = BlasterLane()
+        return lane
+
+    @asynccontextmanager
+    async def slot(self, blasters, priority: int = PRIORITY_STEP):
+        """Hold exclusive use of one or several blasters for the duration of the block."""
+        if isinstance(blasters, str):
+            blasters = [blasters]
+        # Lanes are always taken in the same order so that entities sharing
+        # some of their blasters can't deadlock.
+        acquired = []
+        try:
+            for blaster in sorted(set(blasters)):
+                lane = self.lane(blaster)
+                await lane.acquire(priority)
+                acquired.append(lane)
+            yield
+        finally:
+            for lane in reversed(acquired):
+                lane.release()
+
+    def stats(self) -> dict:
+        """Return the statistics of every known blaster."""
+        return {blaster: lane.stats() for blaster, lane in self._lanes.items()}
+
+
+def get_scheduler(hass: HomeAssistant) -> TransmitScheduler:
+    """Return the scheduler shared by every entity of the integration."""
+    data = hass.data.setdefault(DOMAIN, {})
+    scheduler = data.get(DATA_SCHEDULER)
+    if scheduler is None:
+        scheduler = data[DATA_SCHEDULER] = TransmitScheduler()
+    return scheduler
@@ -0,0 +1,52 @@
+"""Optional diagnostic sensors reporting the transmission latency of an entity."""
+from __future__ import annotations
+
+from homeassistant.components.sensor import SensorEntity
+from homeassistant.const import CONF_NAME
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import EntityCategory
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+
+from .metrics import METRIC_SERVICE_CALL, get_metrics
+
+CONF_UNIQUE_ID = "unique_id"
+
+
+async def async_setup_platform(
+    hass: HomeAssistant,
+    config: ConfigType,
+    async_add_entities: AddEntitiesCallback,
+    discovery_info: DiscoveryInfoType | None = None,
+):
+    if discovery_info is None:
+        return
+
+    async_add_entities(
+        [
+            TransmitLatencySensor(
+                discovery_info[CONF_UNIQUE_ID], discovery_info[CONF_NAME]
+            )
+        ]
+    )
+
+
+class TransmitLatencySensor(SensorEntity):
+    """Median remote.send_command latency of a humidifier, in milliseconds."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_native_unit_of_measurement = "ms"
+    _attr_icon = "mdi:timer-outline"
+
+    def __init__(self, unique_id: str, name: str):
+        self._entity = unique_id
+        self._attr_unique_id = f"{unique_id}_transmit_latency"
+        self._attr_name = f"{name} transmit latency"
+
+    async def async_update(self):
+        summary = get_metrics(self.hass).entity_summary(self._entity)
+        latency = summary.get(METRIC_SERVICE_CALL, {})
+        self._attr_native_value = (
+            round(latency["p50"] * 1000, 1) if "p50" in latency else None
+        )
+        self._attr_extra_state_attributes = summary
@@ -0,0 +1,273 @@
+"""Fetch device code files from the code repository and keep them verified."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+from aiohttp import ClientError, ClientTimeout
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .const import CODES_SOURCE, SYNC_CHUNK_SIZE, SYNC_CONCURRENCY, SYNC_TIMEOUT
+
+_LOGGER = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+METADATA_FILE = ".sync.json"
+
+
+class CodeSetSync:
+    """Download code files listed by the index manifest of a code source.
+
+    The manifest maps device codes to the SHA-256 of their file. Files are
+    streamed to a temporary file, checked against the manifest and moved
+    into place atomically. ETag and Last-Modified validators of every
+    downloaded file are kept next to the files, so later checks only cost
+    a conditional request. Files placed by hand are never replaced.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        codes_dir: str,
+        source: str = CODES_SOURCE,
+        session=None,
+        concurrency: int = SYNC_CONCURRENCY,
+    ):
+        self.hass = hass
+        self._codes_dir = codes_dir
+        self._source = source if source.endswith("/") else source + "/"
+        self._session = session
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._metadata: dict | None = None
+        self._dirty = False
+        self._save_lock = asyncio.Lock()
+        self._index: dict | None = None
+        self._index_lock = asyncio.Lock()
+        self._fetching: dict[int, asyncio.Future] = {}
+        self.downloaded = 0
+        self.not_modified = 0
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = async_get_clientsession(self.hass)
+        return self._session
+
+    def path(self, device_code: int) -> str:
+        """Return the path of the Json file of a device code."""
+        return os.path.join(self._codes_dir, f"{device_code}.json")
+
+    async def async_ensure(self, device_codes, refresh: bool = False) -> None:
+        """Make sure the files of device codes exist, fetching them concurrently.
+
+        With refresh, files downloaded earlier are revalidated as well.
+        Raises when any of the files could not be fetched.
+        """
+        results = await asyncio.gather(
+            *(self._async_ensure_one(code, refresh) for code in set(device_codes)),
+            return_exceptions=True,
+        )
+        if self._dirty:
+            self._dirty = False
+            await self._async_save_metadata()
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+
+    async def _async_ensure_one(self, device_code: int, refresh: bool) -> None:
+        fetching = self._fetching.get(device_code)
+        if fetching is not None:
+            return await asyncio.shield(fetching)
+
+        future = self._fetching[device_code] = self.hass.loop.create_future()
+        try:
+            await self._async_sync(device_code, refresh)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else waits on it.
+            future.exception()
+            raise
+        else:
+            future.set_result(None)
+        finally:
+            del self._fetching[device_code]
+
+    async def _async_sync(self, device_code: int, refresh: bool) -> None:
+        metadata = await self._async_metadata()
+        path = self.path(device_code)
+        exists = await self.hass.async_add_executor_job(os.path.exists, path)
+        known = metadata["files"].get(str(device_code))
+
+        if exists and (known is None or not refresh):
+            return
+
+        index = await self._async_index()
+        expected = index.get(str(device_code), {}).get("sha256")
+        if exists and known is not None and known.get("sha256") == expected:
+            return
+
+        headers = {}
+        if exists and known is not None:
+            if known.get("etag"):
+                headers["If-None-Match"] = known["etag"]
+            if known.get("last_modified"):
+                headers["If-Modified-Since"] = known["last_modified"]
+
+        async with self._semaphore:
+            entry = await self._async_download(
+                f"{device_code}.json", path, headers, expected
+            )
+
+        if entry is None:
+            self.not_modified += 1
+            return
+
+        self.downloaded += 1
+        metadata["files"][str(device_code)] = entry
+        self._dirty = True
+        _LOGGER.info("Device json file %s has been downloaded", device_code)
+
+    async def _async_index(self) -> dict:
+        """Return the manifest, revalidating it once per instance."""
+        async with self._index_lock:
+            if self._index is not None:
+                return self._index
+
+            metadata = await self._async_metadata()
+            cached = metadata.get("index") or {}
+            headers = {}
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+            try:
+                async with self.session.get(
+                    self._source + INDEX_FILE,
+                    headers=headers,
+                    timeout=ClientTimeout(total=SYNC_TIMEOUT),
+                ) as response:
+                    if response.status == 304:
+                        self._index = cached.get("codes", {})
+                    elif response.status == 200:
+                        data = await response.json(content_type=None)
+                        self._index = data.get("codes", {})
+                        metadata["index"] = {
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                            "codes": self._index,
+                        }
+                        self._dirty = True
+                    else:
+                        raise ClientError(f"HTTP {response.status}")
+            except (ClientError, asyncio.TimeoutError, ValueError) as e:
+                # Without a manifest files are still fetched, just unverified.
+                _LOGGER.debug("Couldn't fetch the code index: %s", e)
+                self._index = cached.get("codes", {})
+            return self._index
+
+    async def _async_download(self, name, path, headers, expected) -> dict | None:
+        """Stream a file to disk, returning its metadata or None when unchanged."""
+        try:
+            async with self.session.get(
+                self._source + name,
+                headers=headers,
+                timeout=ClientTimeout(total=SYNC_TIMEOUT),
+            ) as response:
+                if response.status == 304:
+                    return None
+                if response.status != 200:
+                    raise Exception(f"File not found: HTTP {response.status}")
+
+                temp = f"{path}.{os.getpid()}.tmp"
+                digest = hashlib.sha256()
+                handle = await self.hass.async_add_executor_job(
+                    _open_temp, self._codes_dir, temp
+                )
+                try:
+                    try:
+                        async for chunk in response.content.iter_chunked(
+                            SYNC_CHUNK_SIZE
+                        ):
+                            digest.update(chunk)
+                            await self.hass.async_add_executor_job(handle.write, chunk)
+                    finally:
+                        await self.hass.async_add_executor_job(handle.close)
+
+                    checksum = digest.hexdigest()
+                    if expected is not None and checksum != expected:
+                        raise Exception(f"Checksum mismatch for {name}")
+                except BaseException:
+                    await self.hass.async_add_executor_job(_remove, temp)
+                    raise
+                await self.hass.async_add_executor_job(os.replace, temp, path)
+
+                return {
+                    "sha256": checksum,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+        except (ClientError, asyncio.TimeoutError) as e:
+            raise Exception(f"Couldn't download {name}: {e}")
+
+    async def _async_metadata(self) -> dict:
+        if self._metadata is None:
+            self._metadata = await self.hass.async_add_executor_job(
+                _read_metadata, os.path.join(self._codes_dir, METADATA_FILE)
+            )
+        return self._metadata
+
+    async def _async_save_metadata(self) -> None:
+        async with self._save_lock:
+            data = json.dumps(self._metadata, indent=2)
+            await self.hass.async_add_executor_job(
+                _write_atomic, os.path.join(self._codes_dir, METADATA_FILE), data
+            )
+
+
+def _open_temp(codes_dir: str, path: str):
+    os.makedirs(codes_dir, 0o755, True)
+    return open(path, "wb")
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _read_metadata(path: str) -> dict:
+    try:
+        with open(path) as j:
+            metadata = json.load(j)
+    except (FileNotFoundError, ValueError):
+        metadata = {}
+    metadata.setdefault("files", {})
+    return metadata
+
+
+def _write_atomic(path: str, data: str) -> None:
+    os.makedirs(os.path.dirname(path), 0o755, True)
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "w") as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+def build_index(codes_dir: str) -> dict:
+    """Return the manifest of the code files of a directory."""
+    codes = {}
+    for name in sorted(os.listdir(codes_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext != ".json" or not stem.isdigit():
+            continue
+        with open(os.path.join(codes_dir, name), "rb") as f:
+            data = f.read()
+        codes[stem] = {"sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
+    return {"codes": codes}
+
@@ -0,0 +1,240 @@
+"""Send through one or several blasters, skipping the unhealthy ones."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    DEFAULT_HEDGE_BUDGET,
+    DOMAIN,
+    TARGET_COOLDOWN,
+    TARGET_MAX_FAILURES,
+    TARGET_SLOW_LATENCY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class BlasterTimeout(Exception):
+    """A blaster did not answer in time, the command may or may not be sent."""
+
+
+class CircuitOpen(Exception):
+    """Every blaster of a target set is failing, the call was not attempted."""
+
+
+POLICY_FANOUT = "fanout"
+POLICY_HEDGED = "hedged"
+POLICIES = [POLICY_FANOUT, POLICY_HEDGED]
+
+DATA_HEALTH = "health"
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Weight of the latest sample in the moving average of the latency.
+LATENCY_SMOOTHING = 0.3
+
+
+class TargetHealth:
+    """Latency record and circuit breaker of one blaster.
+
+    The breaker opens after consecutive failures and fails calls fast for
+    a cooldown. Then calls are let through again; the first failure opens
+    it anew, the first success closes it.
+    """
+
+    __slots__ = ("latency", "failures", "successes", "errors", "skip_until")
+
+    def __init__(self):
+        self.latency: float | None = None
+        self.failures = 0
+        self.successes = 0
+        self.errors = 0
+        self.skip_until = 0.0
+
+    @property
+    def state(self) -> str:
+        if self.failures < TARGET_MAX_FAILURES:
+            return STATE_CLOSED
+        if time.monotonic() < self.skip_until:
+            return STATE_OPEN
+        return STATE_HALF_OPEN
+
+    @property
+    def available(self) -> bool:
+        return self.state != STATE_OPEN
+
+    @property
+    def slow(self) -> bool:
+        return self.latency is not None and self.latency > TARGET_SLOW_LATENCY
+
+    def record_success(self, latency: float) -> None:
+        self.successes += 1
+        self.failures = 0
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+
+    def record_failure(self) -> None:
+        self.errors += 1
+        self.failures += 1
+        if self.failures >= TARGET_MAX_FAILURES:
+            self.skip_until = time.monotonic() + TARGET_COOLDOWN
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "slow": self.slow,
+            "latency": self.latency,
+            "successes": self.successes,
+            "errors": self.errors,
+            "consecutive_failures": self.failures,
+        }
+
+
+class HealthRegistry:
+    """Health of every blaster, shared by the entities sending through it."""
+
+    def __init__(self):
+        self._targets: dict[str, TargetHealth] = {}
+
+    def get(self, target: str) -> TargetHealth:
+        health = self._targets.get(target)
+        if health is None:
+            health = self._targets[target] = TargetHealth()
+        return health
+
+    def stats(self) -> dict:
+        return {target: health.stats() for target, health in self._targets.items()}
+
+
+def get_health_registry(hass: HomeAssistant) -> HealthRegistry:
+    """Return the blaster health shared by every entity of the integration."""
+    data = hass.data.setdefault(DOMAIN, {})
+    registry = data.get(DATA_HEALTH)
+    if registry is None:
+        registry = data[DATA_HEALTH] = HealthRegistry()
+    return registry
+
+
+class TargetSet:
+    """Blasters a controller transmits through and the policy to use them.
+
+    With fan-out every available blaster transmits at once. Hedged sends
+    go through the fastest blaster and only fire the next one when the
+    previous call hasn't returned within the budget, or failed. A call
+    succeeds when any blaster succeeds. Slow blasters are skipped while
+    others are fast enough, blasters whose breaker is open are skipped
+    until it closes again.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        targets,
+        policy: str = POLICY_FANOUT,
+        budget: float = DEFAULT_HEDGE_BUDGET,
+    ):
+        self.targets = [targets] if isinstance(targets, str) else list(targets)
+        if not self.targets:
+            raise Exception("At least one controller target is required.")
+        if policy not in POLICIES:
+            raise Exception(f"The controller policy '{policy}' is not supported.")
+        self.policy = policy
+        self.budget = budget
+        self._health = get_health_registry(hass)
+
+    def __str__(self) -> str:
+        return "+".join(self.targets)
+
+    def candidates(self) -> list[str]:
+        """Return the targets to use, fastest first."""
+        available = [t for t in self.targets if self._health.get(t).available]
+        if not available:
+            raise CircuitOpen(f"Every blaster of {self} is failing")
+        fast = [t for t in available if not self._health.get(t).slow]
+        return sorted(fast or available, key=lambda t: self._health.get(t).latency or 0.0)
+
+    async def async_call(self, call, timeout: float | None = None, duration: float = 0.0):
+        """Await call(target) for the targets chosen by the policy.
+
+        Each call is abandoned after timeout seconds. duration is the time
+        the call is expected to take besides the latency of the blaster.
+        """
+        targets = self.candidates()
+        if len(targets) == 1:
+            await self._async_call_one(call, targets[0], timeout, duration)
+        elif self.policy == POLICY_HEDGED:
+            await self._async_hedged(call, targets, timeout, duration)
+        else:
+            await self._async_fanout(call, targets, timeout, duration)
+
+    async def _async_call_one(self, call, target: str, timeout, duration) -> None:
+        health = self._health.get(target)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(call(target), timeout)
+        except asyncio.TimeoutError:
+            health.record_failure()
+            raise BlasterTimeout(f"{target} did not answer within {timeout:.1f} s")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            health.record_failure()
+            raise
+        health.record_success(time.monotonic() - started - duration)
+
+    async def _async_fanout(self, call, targets: list[str], timeout, duration) -> None:
+        results = await asyncio.gather(
+            *(
+                self._async_call_one(call, target, timeout, duration)
+                for target in targets
+            ),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        for target, result in zip(targets, results):
+            if isinstance(result, BaseException):
+                _LOGGER.debug("Sending through %s failed: %s", target, result)
+        if len(errors) == len(targets):
+            raise errors[0]
+
+    async def _async_hedged(self, call, targets: list[str], timeout, duration) -> None:
+        pending = set()
+        error = None
+        for index, target in enumerate(targets):
+            task = asyncio.ensure_future(
+                self._async_call_one(call, target, timeout, duration)
+            )
+            task.add_done_callback(_retrieve)
+            pending.add(task)
+            last = index == len(targets) - 1
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=None if last else self.budget + duration,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    _LOGGER.debug("%s is over budget, hedging", target)
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        # Slower calls keep running so their health is recorded.
+                        return
+                    error = task.exception()
+                if not last:
+                    break
+        raise error
+
+
+def _retrieve(task: asyncio.Task) -> None:
+    # Calls outlived by a successful hedge may fail unobserved.
+    if not task.cancelled():
+        task.exception()
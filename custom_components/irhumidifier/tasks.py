@@ -0,0 +1,122 @@
+"""Run the fire-and-forget work of an entity with bounded concurrency."""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import TASK_BACKLOG, TASK_CONCURRENCY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class EntityTaskManager:
+    """Track the background tasks of one entity.
+
+    At most ``limit`` tasks run at once and at most ``backlog`` wait for
+    their turn; further submissions are dropped. A task submitted with a
+    key supersedes a waiting task of the same key, so only the latest
+    request of a kind is carried out.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        name: str,
+        limit: int = TASK_CONCURRENCY,
+        backlog: int = TASK_BACKLOG,
+    ):
+        self.hass = hass
+        self._name = name
+        self._semaphore = asyncio.Semaphore(limit)
+        self._backlog = backlog
+        self._tasks: set[asyncio.Task] = set()
+        self._queued: dict[asyncio.Task, tuple] = {}
+        self._keyed: dict[str, asyncio.Task] = {}
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.dropped = 0
+        self.superseded = 0
+
+    @callback
+    def submit(self, coro, key: str | None = None) -> asyncio.Task | None:
+        """Schedule a coroutine, returning its task or None when dropped."""
+        if key is not None:
+            previous = self._keyed.get(key)
+            if previous is not None and previous in self._queued:
+                self.superseded += 1
+                self._dequeue(previous).close()
+                self._tasks.discard(previous)
+                previous.cancel()
+
+        if len(self._queued) >= self._backlog:
+            self.dropped += 1
+            coro.close()
+            _LOGGER.warning(
+                "Dropping a request to %s, %d requests are already waiting",
+                self._name,
+                len(self._queued),
+            )
+            return None
+
+        task = self.hass.async_create_task(self._run(coro))
+        self._tasks.add(task)
+        self._queued[task] = (coro, key)
+        if key is not None:
+            self._keyed[key] = task
+        task.add_done_callback(self._done)
+        return task
+
+    async def _run(self, coro):
+        async with self._semaphore:
+            self._dequeue(asyncio.current_task())
+            try:
+                await coro
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += 1
+                _LOGGER.exception("A request to %s failed", self._name)
+            else:
+                self.completed += 1
+
+    @callback
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        coro = self._dequeue(task)
+        if coro is not None:
+            # Cancelled before it started, the coroutine was never awaited.
+            coro.close()
+        if task.cancelled():
+            self.cancelled += 1
+
+    def _dequeue(self, task: asyncio.Task):
+        queued = self._queued.pop(task, None)
+        if queued is None:
+            return None
+        coro, key = queued
+        if key is not None and self._keyed.get(key) is task:
+            del self._keyed[key]
+        return coro
+
+    async def async_cancel(self) -> None:
+        """Cancel every running and waiting task and wait for them to end."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Return the number of running and waiting tasks and the outcomes."""
+        return {
+            "running": len(self._tasks) - len(self._queued),
+            "waiting": len(self._queued),
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "dropped": self.dropped,
+            "superseded": self.superseded,
+        }
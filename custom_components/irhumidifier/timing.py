@@ -0,0 +1,115 @@
+"""Per device code timing profiles and their calibration."""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.timing"
+STORAGE_VERSION = 1
+
+DATA_TIMING = "timing"
+
+PAIR_SEPARATOR = ">"
+ANY_COMMAND = "*"
+
+
+class TimingProfile:
+    """Minimum safe gaps between commands of one device code.
+
+    Pairs are keyed ``"previous>following"``, ``"previous>*"`` applies to
+    any following command. Gaps that are not declared fall back to the
+    configured delay of the entity.
+    """
+
+    def __init__(self, pairs: dict[str, float] | None = None):
+        self.pairs = dict(pairs or {})
+
+    def gap(self, previous: str, following: str, default: float) -> float:
+        """Return the gap to keep between two commands."""
+        pairs = self.pairs
+        if not pairs:
+            return default
+        gap = pairs.get(f"{previous}{PAIR_SEPARATOR}{following}")
+        if gap is None:
+            gap = pairs.get(f"{previous}{PAIR_SEPARATOR}{ANY_COMMAND}", default)
+        return gap
+
+    def gaps(self, commands, default: float) -> list[float]:
+        """Return the gaps between consecutive commands of a sequence."""
+        return [
+            self.gap(previous, following, default)
+            for previous, following in zip(commands, commands[1:])
+        ]
+
+
+class TimingStore:
+    """Timing profiles declared by code files and refined by calibration."""
+
+    def __init__(self, hass: HomeAssistant):
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._calibrated: dict[str, dict[str, float]] | None = None
+        self._profiles: dict[int, TimingProfile] = {}
+        self._lock = asyncio.Lock()
+
+    async def async_profile(self, device_code: int, declared=None) -> TimingProfile:
+        """Return the shared profile of a device code."""
+        profile = self._profiles.get(device_code)
+        if profile is not None:
+            return profile
+
+        async with self._lock:
+            if self._calibrated is None:
+                self._calibrated = await self._store.async_load() or {}
+
+        profile = self._profiles.get(device_code)
+        if profile is None:
+            pairs = dict((declared or {}).get("pairs", {}))
+            pairs.update(self._calibrated.get(str(device_code), {}))
+            profile = self._profiles[device_code] = TimingProfile(pairs)
+        return profile
+
+    async def async_save_gap(
+        self, device_code: int, previous: str, following: str, gap: float
+    ) -> None:
+        """Store a calibrated gap and apply it to the shared profile."""
+        key = f"{previous}{PAIR_SEPARATOR}{following}"
+        self._calibrated.setdefault(str(device_code), {})[key] = gap
+        profile = self._profiles.get(device_code)
+        if profile is not None:
+            profile.pairs[key] = gap
+        await self._store.async_save(self._calibrated)
+
+
+def get_timing_store(hass: HomeAssistant) -> TimingStore:
+    """Return the timing store shared by every entity of the integration."""
+    data = hass.data.setdefault(DOMAIN, {})
+    store = data.get(DATA_TIMING)
+    if store is None:
+        store = data[DATA_TIMING] = TimingStore(hass)
+    return store
+
+
+async def async_calibrate(trial, low: float, high: float, iterations: int) -> float | None:
+    """Binary search the smallest delay for which a trial succeeds.
+
+    ``trial`` is awaited with a candidate delay and returns whether the
+    device followed both commands. Returns None when even ``high`` fails.
+    """
+    if not await trial(high):
+        return None
+
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        if await trial(middle):
+            high = middle
+        else:
+            low = middle
+        _LOGGER.debug("Calibration narrowed to %.3f-%.3f s", low, high)
+    return high
@@ -0,0 +1,183 @@
+"""Conversion between Pronto, LIRC pulse and Broadlink packet formats."""
+import struct
+
+PRONTO_CLOCK = 0.241246
+PRONTO_FREQUENCY = 38000
+
+# Space closing a pulse train that ends with a mark, in microseconds.
+REPEAT_GAP = 20000
+
+BROADLINK_IR = 0x26
+BROADLINK_TICK = 269 / 8192
+BROADLINK_TRAILER = b"\x0d\x05"
+
+_WORD = struct.Struct(">H")
+_HEADER = struct.Struct("<BBH")
+
+
+def pronto2lirc(pronto):
+    """Convert a binary Pronto code into a list of pulse widths in microseconds."""
+    if len(pronto) % 2:
+        raise ValueError("Pronto code should consist of 16-bit words")
+
+    words = len(pronto) // 2
+    if words < 4:
+        raise ValueError("Number of pulse widths does not match the preamble")
+
+    codes = struct.unpack_from(">%dH" % words, pronto)
+
+    if codes[0]:
+        raise ValueError("Pronto code should start with 0000")
+    if words != 4 + 2 * (codes[2] + codes[3]):
+        raise ValueError("Number of pulse widths does not match the preamble")
+
+    frequency = 1 / (codes[1] * PRONTO_CLOCK)
+    return [int(round(code / frequency)) for code in codes[4:]]
+
+
+def lirc2broadlink(pulses, repeat=0):
+    """Convert a list of pulse widths in microseconds into a Broadlink packet."""
+    return ticks2broadlink([int(pulse * 269 / 8192) for pulse in pulses], repeat)
+
+
+def ticks2broadlink(ticks, repeat=0):
+    """Convert a list of raw tick values into a Broadlink packet."""
+    length = sum(1 if tick < 256 else 3 for tick in ticks)
+
+    # Pad the packet size to a multiple of 16 for 128-bit AES encryption.
+    size = _HEADER.size + length + len(BROADLINK_TRAILER)
+    remainder = (size + 4) % 16
+    if remainder:
+        size += 16 - remainder
+
+    packet = bytearray(size)
+    _HEADER.pack_into(packet, 0, BROADLINK_IR, repeat, length)
+
+    offset = _HEADER.size
+    for tick in ticks:
+        if tick < 0:
+            raise ValueError("Pulse widths should not be negative")
+        if tick < 256:
+            packet[offset] = tick
+            offset += 1
+        else:
+            _WORD.pack_into(packet, offset + 1, tick)
+            offset += 3
+
+    packet[offset : offset + len(BROADLINK_TRAILER)] = BROADLINK_TRAILER
+    return packet
+
+
+def broadlink2ticks(packet):
+    """Return the repeat count and raw tick values of a Broadlink IR packet."""
+    data = memoryview(packet)
+    if len(data) < _HEADER.size:
+        raise ValueError("Broadlink packet is too short")
+
+    kind, repeat, length = _HEADER.unpack_from(data)
+    if kind != BROADLINK_IR:
+        raise ValueError("Broadlink packet is not an IR packet")
+    if _HEADER.size + length > len(data):
+        raise ValueError("Broadlink packet length does not match its header")
+
+    ticks = []
+    offset = _HEADER.size
+    end = offset + length
+    while offset < end:
+        tick = data[offset]
+        if tick:
+            offset += 1
+        else:
+            if offset + 3 > end:
+                raise ValueError("Broadlink packet ends inside a pulse")
+            (tick,) = _WORD.unpack_from(data, offset + 1)
+            offset += 3
+        ticks.append(tick)
+
+    return repeat, ticks
+
+
+def broadlink2lirc(packet):
+    """Convert a Broadlink IR packet into a list of pulse widths in microseconds."""
+    _, ticks = broadlink2ticks(packet)
+    return [int(round(tick * 8192 / 269)) for tick in ticks]
+
+
+def broadlink_sequence(packets, gap):
+    """Merge Broadlink packets into one packet sent as a single transmission.
+
+    A run of identical packets is expressed with the repeat byte of the
+    header. Different pulse trains are concatenated, separated by a space
+    of at least ``gap`` microseconds, or by the matching entry when ``gap``
+    lists one gap per junction between packets.
+    """
+    packets = list(packets)
+    if not packets:
+        raise ValueError("Cannot merge an empty sequence")
+
+    first = packets[0]
+    if all(packet == first for packet in packets):
+        repeat, ticks = broadlink2ticks(first)
+        total = (repeat + 1) * len(packets) - 1
+        if total <= 0xFF:
+            return ticks2broadlink(ticks, total)
+
+    if isinstance(gap, (int, float)):
+        gap = [gap] * (len(packets) - 1)
+
+    merged = []
+    for index, packet in enumerate(packets):
+        repeat, ticks = broadlink2ticks(packet)
+        for copy in range(repeat + 1):
+            if merged:
+                # Repeats of one packet keep their own trailing space.
+                gap_ticks = 0 if copy else min(int(gap[index - 1] * 269 / 8192), 0xFFFF)
+                # Pulse trains start with a mark, so the previous train has
+                # to end with a space that is at least as long as the gap.
+                if len(merged) % 2:
+                    merged.append(gap_ticks)
+                else:
+                    merged[-1] = max(merged[-1], gap_ticks)
+            merged.extend(ticks)
+
+    return ticks2broadlink(merged)
+
+
+def broadlink2pulses(packet, gap=REPEAT_GAP):
+    """Convert a Broadlink IR packet into pulse widths, repeats included.
+
+    Marks and spaces alternate, starting with a mark. Each copy of a train
+    that ends with a mark is followed by a space of ``gap`` microseconds,
+    so the result always ends with a space.
+    """
+    repeat, ticks = broadlink2ticks(packet)
+    pulses = [int(round(tick * 8192 / 269)) for tick in ticks]
+    if len(pulses) % 2:
+        pulses.append(gap)
+    return pulses * (repeat + 1)
+
+
+def broadlink2raw(packet, gap=REPEAT_GAP):
+    """Convert a Broadlink IR packet into signed pulse widths.
+
+    Marks are positive and spaces negative, the format of the ESPHome
+    remote_transmitter raw action.
+    """
+    return [
+        pulse if index % 2 == 0 else -pulse
+        for index, pulse in enumerate(broadlink2pulses(packet, gap))
+    ]
+
+
+def broadlink2pronto(packet, frequency=PRONTO_FREQUENCY, gap=REPEAT_GAP):
+    """Convert a Broadlink IR packet into a Pronto hex code.
+
+    Repeats are spelled out in the once sequence, the repeat sequence is
+    left empty.
+    """
+    clock = int(round(1000000 / (frequency * PRONTO_CLOCK)))
+    period = clock * PRONTO_CLOCK
+    pulses = broadlink2pulses(packet, gap)
+    words = [0, clock, len(pulses) // 2, 0]
+    words.extend(min(max(int(round(pulse / period)), 1), 0xFFFF) for pulse in pulses)
+    return " ".join(f"{word:04X}" for word in words)
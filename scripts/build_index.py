@@ -0,0 +1,26 @@
+"""Write the index manifest of the code files fetched by the integration.
+
+Run from the repository root after adding or changing a code file:
+
+    python scripts/build_index.py [codes_dir]
+"""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from custom_components.irhumidifier.sync import INDEX_FILE, build_index  # noqa: E402
+
+
+def main(codes_dir):
+    index = build_index(codes_dir)
+    with open(os.path.join(codes_dir, INDEX_FILE), "w") as f:
+        json.dump(index, f, indent=2)
+        f.write("\n")
+    print(f"{len(index['codes'])} code files indexed")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "codes"))
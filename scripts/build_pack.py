@@ -0,0 +1,35 @@
+"""Validate the code files and compile them into the code pack.
+
+Run from the repository root after adding or changing a code file:
+
+    python scripts/build_pack.py [codes_dir] [-o output]
+
+Exits with status 1 without writing the pack when any file has problems.
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from custom_components.irhumidifier.codepack import compile_pack  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("codes_dir", nargs="?", default=os.path.join(ROOT, "codes"))
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    count, problems = compile_pack(args.codes_dir, args.output)
+    for name, errors in problems.items():
+        for error in errors:
+            print(f"{name}: {error}", file=sys.stderr)
+    if problems:
+        sys.exit(1)
+    print(f"{count} code files packed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Exhaustive checks of the press planner against a plain breadth-first search.
+
+The device is the bundled code file with narrower ranges, so that every
+start state can be planned to every target state, including the preset
+mode effects, the steppers and the function toggles that condition on
+each other.
+"""
+from collections import deque
+from dataclasses import replace
+import itertools
+import json
+import os
+
+import pytest
+
+from custom_components.irhumidifier.planner import (
+    COMMAND_OFF,
+    COMMAND_ON,
+    DeviceModel,
+    DeviceState,
+    TargetState,
+)
+
+CODE_FILE = os.path.join(os.path.dirname(__file__), "..", "codes", "100.json")
+FUNCTIONS = ["light_mode", "night_mode", "uv_mode"]
+
+
+def device_data(power_cycle: bool) -> dict:
+    with open(CODE_FILE) as j:
+        data = json.load(j)
+    data.update(
+        minHumidity=30,
+        maxHumidity=50,
+        humiditySetPrecision=10,
+        defaultHumidity=40,
+        minManualSpeed=1,
+        maxManualSpeed=3,
+        defaultManualSpeed=2,
+        extraFunctions=FUNCTIONS,
+        powerCyclePlans=power_cycle,
+    )
+    data["commandTypes"] = {
+        command: declaration
+        for command, declaration in data["commandTypes"].items()
+        if declaration["state"] not in ("warm_mist",)
+    }
+    return data
+
+
+def lattice(model: DeviceModel) -> list[DeviceState]:
+    """Return every powered state of a model and the off state."""
+    humidities = range(model.min_humidity, model.max_humidity + 1, model.humidity_step)
+    functions = [
+        frozenset(x)
+        for size in range(len(model.functions) + 1)
+        for x in itertools.combinations(model.functions, size)
+    ]
+    states = [
+        DeviceState(True, mode, speed, humidity, fs)
+        for mode in model.modes
+        for speed in range(model.min_speed, model.max_speed + 1)
+        for humidity in humidities
+        for fs in functions
+    ]
+    return states + [replace(model.default_state, power=False)]
+
+
+def targets(model: DeviceModel) -> list[TargetState]:
+    """Return the off target and every powered target, fields cared or not."""
+    states = lattice(model)
+    modes = [None, *model.modes]
+    speeds = [None, *sorted({s.speed for s in states})]
+    humidities = [None, *sorted({s.humidity for s in states})]
+    functions = [None, *sorted({s.functions for s in states}, key=sorted)]
+    return [TargetState(power=False)] + [
+        TargetState(True, *fields)
+        for fields in itertools.product(modes, speeds, humidities, functions)
+    ]
+
+
+def distances(model: DeviceModel, start: DeviceState) -> dict:
+    """Return the fewest presses from start to every reachable state.
+
+    Without power cycle plans a powered device is only ever turned off as
+    the target, so the search keeps the power on.
+    """
+    commands = list(model.command_types)
+    if start.power and not model.power_cycle:
+        commands = model.core_commands + model.toggle_commands
+    found = {start: 0}
+    queue = deque([start])
+    while queue:
+        state = queue.popleft()
+        for command in commands:
+            following = model.apply(state, command)
+            if following not in found:
+                found[following] = found[state] + 1
+                queue.append(following)
+    return found
+
+
+def optimum(model, start, target, found) -> int | None:
+    if target.power is False:
+        return 1 if start.power else 0
+    costs = [depth for state, depth in found.items() if state.power and target.matches(state)]
+    return min(costs, default=None)
+
+
+@pytest.mark.parametrize("power_cycle", [False, True])
+def test_plans_are_shortest_and_reach_the_target(power_cycle):
+    model = DeviceModel.from_device_data(device_data(power_cycle))
+    all_targets = targets(model)
+    for start in lattice(model):
+        found = distances(model, start)
+        for target in all_targets:
+            best = optimum(model, start, target, found)
+            if best is None:
+                with pytest.raises(ValueError):
+                    model.plan(start, target)
+                continue
+
+            commands = model.plan(start, target)
+            assert target.matches(model.apply_all(start, commands)), (start, target)
+            assert len(commands) == best, (start, target, commands)
+
+
+def test_power_cycle_plans_beat_stepping_back():
+    model = DeviceModel.from_device_data(device_data(True))
+    start = DeviceState(True, "normal", 3, 50, frozenset(FUNCTIONS[:2]))
+    commands = model.plan(start, TargetState(True, "normal", 2, 40, frozenset()))
+    assert commands[:2] == (COMMAND_OFF, COMMAND_ON)
+    assert len(commands) == 2